@@ -0,0 +1,128 @@
+"""
+Donation totals, counts and percentiles, grouped by actor, period,
+donation type and/or nature of donation. These are computed from
+DonationRollup (so never touch the Donation table), with the sums
+done in SQL. Percentiles are estimated from the rollups' histograms.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.db.models import Max, Min, Q, Sum
+
+from datafetch import models
+from datafetch.models.rollups import estimate_percentile
+
+
+ACTOR_DIMENSIONS = ('recipient', 'donor')
+PERIOD_DIMENSIONS = ('year', 'quarter', 'month')
+DIMENSIONS = ACTOR_DIMENSIONS + PERIOD_DIMENSIONS + ('donation_type', 'nature_of_donation')
+
+
+class AggregateError(ValueError):
+    pass
+
+
+def _period(month, dimension):
+    if month is None:
+        return None
+    if dimension == 'year':
+        return month.year
+    if dimension == 'quarter':
+        return '{}-Q{}'.format(month.year, (month.month - 1) // 3 + 1)
+    return month.strftime('%Y-%m')
+
+
+def _format_money(value):
+    return None if value is None else '{:f}'.format(value.quantize(Decimal('0.01')))
+
+
+def donation_totals(group_by=(), actor=None, role=None, since=None, until=None,
+                    donation_type=None, percentiles=(50, 90), descendants=False):
+    """
+    Return a list of groups, biggest total first. `role` is
+    'recipient' or 'donor', and says which side of each donation
+    `actor` (and grouping by actor) refers to. With `descendants`, the
+    donations of the organizations under `actor` (e.g. a party's
+    accounting units) count too.
+    """
+    for dimension in group_by:
+        if dimension not in DIMENSIONS:
+            raise AggregateError("Unable to group by '{}'".format(dimension))
+    roles = {x for x in group_by if x in ACTOR_DIMENSIONS}
+    if role:
+        roles.add(role)
+    if len(roles) > 1:
+        raise AggregateError('Donations can be grouped or filtered by recipient or by donor, but not both')
+    role = roles.pop() if roles else 'recipient'
+    periods = [x for x in group_by if x in PERIOD_DIMENSIONS]
+    if len(periods) > 1:
+        raise AggregateError('Donations can only be grouped by one period')
+
+    queryset = models.DonationRollup.objects.filter(role=role)
+    if actor is not None:
+        queryset = queryset.filter(models.subtree_q('actor_id', actor) if descendants else Q(actor_id=actor))
+    if since is not None:
+        queryset = queryset.filter(month__gte=since.replace(day=1))
+    if until is not None:
+        queryset = queryset.filter(month__lte=until)
+    if donation_type is not None:
+        queryset = queryset.filter(donation_type=donation_type)
+
+    # rollup columns to group on in SQL
+    columns = []
+    for dimension in group_by:
+        if dimension in ACTOR_DIMENSIONS:
+            columns.append('actor')
+        elif dimension in PERIOD_DIMENSIONS:
+            columns.append('month')
+        else:
+            columns.append(dimension)
+    rows = queryset.values(*columns).annotate(
+        count=Sum('count'), total=Sum('total'),
+        min_value=Min('min_value'), max_value=Max('max_value')).order_by()
+
+    # fold months into years and quarters
+    groups = OrderedDict()
+    for row in rows:
+        key = tuple(_period(row['month'], x) if x in PERIOD_DIMENSIONS else row[c] for x, c in zip(group_by, columns))
+        group = groups.get(key)
+        if group is None:
+            groups[key] = dict(row)
+            continue
+        group['count'] += row['count']
+        group['total'] += row['total']
+        group['min_value'] = min(group['min_value'], row['min_value'])
+        group['max_value'] = max(group['max_value'], row['max_value'])
+
+    if percentiles:
+        histograms = {}
+        for values in queryset.values_list(*(columns + ['histogram'])).iterator():
+            key = tuple(_period(v, x) if x in PERIOD_DIMENSIONS else v for x, v in zip(group_by, values[:-1]))
+            counts = [int(x) for x in values[-1].split(',')]
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = counts
+            else:
+                histograms[key] = [a + b for a, b in zip(merged, counts)]
+
+    actors = {}
+    if ACTOR_DIMENSIONS[0] in group_by or ACTOR_DIMENSIONS[1] in group_by:
+        ids = {key[group_by.index(role)] for key in groups}
+        for pk, name, kind, slug in models.Actor.objects.non_polymorphic().filter(id__in=ids).values_list('id', 'name', 'kind', 'slug'):
+            actors[pk] = OrderedDict([('id', pk), ('name', name), ('url', models.actor_url(kind, pk, slug))])
+
+    results = []
+    for key, group in sorted(groups.items(), key=lambda x: x[1]['total'], reverse=True):
+        result = OrderedDict()
+        for dimension, value in zip(group_by, key):
+            result[dimension] = actors.get(value) if dimension in ACTOR_DIMENSIONS else value
+        result['count'] = group['count']
+        result['total'] = _format_money(group['total'])
+        result['min'] = _format_money(group['min_value'])
+        result['max'] = _format_money(group['max_value'])
+        if percentiles:
+            result['percentiles'] = OrderedDict(
+                (str(p), _format_money(estimate_percentile(histograms[key], p, group['min_value'], group['max_value'])))
+                for p in percentiles)
+        results.append(result)
+    return results
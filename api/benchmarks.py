@@ -0,0 +1,105 @@
+"""
+Benchmarks for serializing API responses. The fixture data is
+created inside the (rolled back) benchmark transaction.
+"""
+from datetime import date, timedelta
+
+from rest_framework.test import APIRequestFactory
+
+from api import aggregates, cache, export, serializers, views
+from datafetch import models, typeahead
+from datafetch.benchmarks import Workload, register
+
+
+def _create_donations(count, num_donors=50):
+    recipient = models.Organization.objects.create(name='Benchmark Party', classification='Political Party')
+    donors = [models.Person.objects.create(name='Benchmark Donor {}'.format(i)) for i in range(num_donors // 2)]
+    donors += [models.Organization.objects.create(name='Benchmark Company {} Ltd'.format(i)) for i in range(num_donors // 2)]
+    models.Donation.objects.bulk_create([models.Donation(
+        donor=donors[i % len(donors)],
+        recipient=recipient,
+        value=1000 + i,
+        donation_type='Cash',
+        accepted_date=date(2015, 1, 1) + timedelta(days=i % 365),
+        reported_date=date(2015, 1, 1) + timedelta(days=i % 365),
+        source='http://search.electoralcommission.org.uk/English/Donations/C{:07d}'.format(i),
+        accounting_units_as_central_party=False,
+        is_bequest=False,
+        is_aggregation=False,
+        is_sponsorship=False,
+    ) for i in range(count)])
+    return recipient
+
+
+@register('serialization', 'DonationSerializer')
+def donation_serializer():
+    recipient = _create_donations(1000)
+    donations = list(recipient.received_donations_from.select_related('donor', 'recipient').order_by('-reported_date', '-id'))
+    return Workload(lambda: serializers.DonationSerializer(donations, many=True).data, len(donations))
+
+
+@register('serialization', 'DonationValuesSerializer')
+def donation_values_serializer():
+    recipient = _create_donations(1000)
+    columns = serializers.DonationValuesSerializer.columns()
+    donations = list(recipient.received_donations_from.order_by('-reported_date', '-id').values(*columns))
+    return Workload(lambda: serializers.DonationValuesSerializer(donations, many=True).data, len(donations))
+
+
+@register('api', 'donations-from (100 row page)')
+def donations_from_page():
+    recipient = _create_donations(5000)
+    request = APIRequestFactory().get('/api/actors/{}/donations-from'.format(recipient.id), {'limit': 100, 'offset': 2500})
+    view = views.ActorReceivedDonationsFromListViewSet.as_view()
+    cache.get_backend().clear()
+    # includes the query, serialization and JSON rendering
+    return Workload(lambda: view(request, pk=recipient.id).render(), 100)
+
+
+@register('api', 'donations-from (100 row page, cached)')
+def donations_from_page_cached():
+    recipient = _create_donations(5000)
+    request = APIRequestFactory().get('/api/actors/{}/donations-from'.format(recipient.id), {'limit': 100, 'offset': 2500})
+    view = views.ActorReceivedDonationsFromListViewSet.as_view()
+    cache.get_backend().clear()
+    # the first request fills the response cache
+    view(request, pk=recipient.id).render()
+    return Workload(lambda: view(request, pk=recipient.id), 100)
+
+
+@register('api', 'export.stream_csv')
+def export_csv():
+    _create_donations(5000)
+    stream = lambda: sum(len(x) for x in export.stream_csv(models.Donation.objects.all(), serializers.DonationValuesSerializer))
+    return Workload(stream, 5000)
+
+
+@register('api', 'donation_totals (by recipient and year)')
+def donation_totals():
+    _create_donations(5000)
+    models.refresh_donation_rollups()
+    return Workload(lambda: aggregates.donation_totals(['recipient', 'year']), 5000)
+
+
+@register('api', 'actor bundle')
+def actor_bundle():
+    recipient = _create_donations(5000)
+    models.refresh_actor_summaries()
+    request = APIRequestFactory().get('/api/actors/{}/bundle'.format(recipient.id))
+    view = views.ActorBundleView.as_view()
+    backend = cache.get_backend()
+
+    def bundle():
+        backend.clear()
+        return view(request, pk=recipient.id).render()
+    return Workload(bundle, 1)
+
+
+@register('api', 'actor autocomplete (10 keystrokes)')
+def actor_autocomplete():
+    _create_donations(5000, num_donors=2000)
+    models.refresh_actor_summaries()
+    index = typeahead.TypeaheadIndex.build()
+    query = 'Benchmark Donor'
+    # the index is built once per data version, so isn't timed
+    return Workload(lambda: [index.complete(query[:n]) for n in range(1, 11)], 10)
@@ -0,0 +1,265 @@
+"""
+A server-side cache of rendered API responses.
+
+Responses are keyed on the data version, the scheme and host (the
+pagination links are absolute), the path, the (sorted) query string and the
+Accept header, so a new import makes every existing entry
+unreachable. That version check is what invalidates the cache: each
+process clears its backend and re-warms it with the URLs it has been
+asked for most, once it notices the version has changed.
+
+The backend is set by API_CACHE in settings:
+
+ * `api.cache.MemoryBackend` - per-process LRU, capped at `max_bytes`
+ * `api.cache.FileBackend` - shared between processes, in `path`,
+   evicting the least recently used files past `max_bytes`
+ * `api.cache.DjangoCacheBackend` - any of Django's CACHES (e.g. Redis),
+   which handles eviction itself
+"""
+from collections import Counter, OrderedDict
+import hashlib
+import os
+from os.path import exists, join
+import pickle
+import threading
+
+from django.conf import settings
+from django.core.urlresolvers import resolve
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.utils.http import urlencode
+from django.utils.module_loading import import_string
+
+from datafetch.dataversion import get_data_version
+
+
+class MemoryBackend(object):
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = len(value[2])
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[2])
+            self.entries[key] = value
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted[2])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class FileBackend(object):
+    def __init__(self, path=None, max_bytes=256 * 1024 * 1024):
+        self.path = path or join(settings.BASE_DIR, 'data', 'api_cache')
+        self.max_bytes = max_bytes
+        # an estimate, as other processes share the directory
+        self.size = None
+        if not exists(self.path):
+            os.makedirs(self.path)
+
+    def _filepath(self, key):
+        return join(self.path, key)
+
+    def get(self, key):
+        filepath = self._filepath(key)
+        try:
+            with open(filepath, 'rb') as f:
+                value = pickle.load(f)
+            # the mtime is the last use, for LRU eviction
+            os.utime(filepath)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return value
+
+    def set(self, key, value):
+        if len(value[2]) > self.max_bytes:
+            return
+        tmp_path = '{}.{}.tmp'.format(self._filepath(key), os.getpid())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._filepath(key))
+        if self.size is None:
+            self._evict()
+        self.size += len(value[2])
+        if self.size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for filename in os.listdir(self.path):
+            filepath = join(self.path, filename)
+            try:
+                stat = os.stat(filepath)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filepath))
+        size = sum(x[1] for x in entries)
+        for _, file_size, filepath in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(filepath)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+        self.size = size
+
+    def clear(self):
+        for filename in os.listdir(self.path):
+            try:
+                os.remove(join(self.path, filename))
+            except FileNotFoundError:
+                pass
+        self.size = 0
+
+
+class DjangoCacheBackend(object):
+    def __init__(self, alias='default', timeout=None):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get(self, key):
+        return self.cache.get('api-response:' + key)
+
+    def set(self, key, value):
+        self.cache.set('api-response:' + key, value, self.timeout)
+
+    def clear(self):
+        # entries for old data versions are unreachable anyway,
+        # and are left for the cache server to evict
+        pass
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+# (scheme, host, path, Accept header) -> number of requests, in this
+# process
+_requests = Counter()
+_requests_lock = threading.Lock()
+MAX_TRACKED_REQUESTS = 10000
+_seen_version = None
+_version_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            backend_class = import_string(settings.API_CACHE['BACKEND'])
+            _backend = backend_class(**settings.API_CACHE.get('OPTIONS', {}))
+        return _backend
+
+
+def get_cache_key(version, scheme, host, path, accept):
+    return hashlib.md5('\n'.join([version, scheme, host, path, accept]).encode('utf8')).hexdigest()
+
+
+def canonical_path(request):
+    """
+    The path with its query parameters sorted.
+    """
+    params = sorted((k, sorted(v)) for k, v in request.GET.lists())
+    if not params:
+        return request.path
+    return '{}?{}'.format(request.path, urlencode(params, doseq=True))
+
+
+def warm(paths):
+    """
+    Render and cache the responses for `paths`, a list of
+    (scheme, host, path, Accept header).
+    """
+    factory = RequestFactory()
+    try:
+        for scheme, host, path, accept in paths:
+            headers = {'HTTP_HOST': host}
+            if accept:
+                headers['HTTP_ACCEPT'] = accept
+            request = factory.get(path, secure=scheme == 'https', **headers)
+            request._api_cache_warming = True
+            match = resolve(request.path)
+            match.func(request, *match.args, **match.kwargs)
+    finally:
+        connection.close()
+
+
+def _version_changed(version):
+    """
+    Called (once per process) on the first request after an import,
+    and on the first request the process handles.
+    """
+    global _seen_version
+    with _version_lock:
+        if version == _seen_version:
+            # (another thread got there first)
+            return
+        first = _seen_version is None
+        _seen_version = version
+    if first:
+        return
+    get_backend().clear()
+    with _requests_lock:
+        paths = [x for x, _ in _requests.most_common(settings.API_CACHE.get('WARM_KEYS', 0))]
+    if paths:
+        threading.Thread(target=warm, args=(paths,), daemon=True).start()
+
+
+class ResponseCacheMixin(object):
+    """
+    Serve GETs from the API response cache, rendering and caching
+    the response on a miss.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return super(ResponseCacheMixin, self).dispatch(request, *args, **kwargs)
+
+        version, _ = get_data_version()
+        if version != _seen_version:
+            _version_changed(version)
+
+        scheme = request.scheme
+        host = request.get_host()
+        path = canonical_path(request)
+        accept = request.META.get('HTTP_ACCEPT', '')
+        if not getattr(request, '_api_cache_warming', False):
+            with _requests_lock:
+                _requests[(scheme, host, path, accept)] += 1
+                if len(_requests) > MAX_TRACKED_REQUESTS:
+                    top = _requests.most_common(MAX_TRACKED_REQUESTS // 10)
+                    _requests.clear()
+                    _requests.update(dict(top))
+
+        backend = get_backend()
+        key = get_cache_key(version, scheme, host, path, accept)
+        cached = backend.get(key)
+        if cached is not None:
+            status, content_type, content = cached
+            return HttpResponse(content, status=status, content_type=content_type)
+
+        response = super(ResponseCacheMixin, self).dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.render()
+            backend.set(key, (response.status_code, response['Content-Type'], response.content))
+        return response
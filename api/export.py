@@ -0,0 +1,100 @@
+"""
+Streaming bulk exports. Rows are fetched in chunks (through a
+server-side cursor on PostgreSQL, and by id otherwise), serialized
+with the API's values serializers and written out one line at a time,
+so memory use doesn't depend on the size of the export.
+"""
+import csv
+import uuid
+
+from django.db import connections, transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+
+CHUNK_SIZE = 2000
+
+
+def iter_values(queryset, columns, chunk_size=None):
+    """
+    Yield a dict of `columns` for every row of `queryset`, in id order.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    queryset = queryset.order_by('id').values_list(*columns)
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        rows = _iter_server_side(queryset, connection, chunk_size)
+    else:
+        rows = _iter_by_id(queryset, columns.index('id'), chunk_size)
+    for row in rows:
+        yield dict(zip(columns, row))
+
+
+def _iter_server_side(queryset, connection, chunk_size):
+    sql, params = queryset.query.sql_with_params()
+    # named cursors only live as long as their transaction
+    with transaction.atomic(using=queryset.db):
+        connection.ensure_connection()
+        cursor = connection.connection.cursor(name='export_{}'.format(uuid.uuid4().hex))
+        cursor.itersize = chunk_size
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            cursor.close()
+
+
+def _iter_by_id(queryset, id_index, chunk_size):
+    last_id = None
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        rows = list(chunk[:chunk_size])
+        for row in rows:
+            yield row
+        if len(rows) < chunk_size:
+            break
+        last_id = rows[-1][id_index]
+
+
+class _Echo(object):
+    """
+    A file-like object that just returns what's written to it,
+    for streaming csv.writer output.
+    """
+    def write(self, value):
+        return value
+
+
+def csv_header(serializer_class):
+    header = []
+    for name in serializer_class.model_serializer.Meta.fields:
+        if name in serializer_class.actor_fields:
+            header += ['{}_{}'.format(name, x) for x in ('id', 'name', 'url')]
+        else:
+            header.append(name)
+    return header
+
+
+def stream_csv(queryset, serializer_class):
+    serializer = serializer_class()
+    writer = csv.writer(_Echo())
+    yield writer.writerow(csv_header(serializer_class))
+    for values in iter_values(queryset, serializer_class.columns()):
+        row = []
+        for name, value in serializer.to_representation(values).items():
+            if name in serializer_class.actor_fields:
+                row += [value['id'], value['name'], value['url']] if value else ['', '', '']
+            else:
+                row.append(value)
+        yield writer.writerow(row)
+
+
+def stream_ndjson(queryset, serializer_class):
+    serializer = serializer_class()
+    encoder = JSONEncoder(ensure_ascii=False)
+    for values in iter_values(queryset, serializer_class.columns()):
+        yield encoder.encode(serializer.to_representation(values)) + '\n'
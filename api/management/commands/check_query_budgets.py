@@ -0,0 +1,62 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import Client
+
+from datafetch import models
+from undertheinfluence.instrumentation import QueryBudgetExceeded, assert_endpoint_within_budget
+
+
+class Command(BaseCommand):
+    help = 'Check that the API endpoints stay within their query budgets (see REQUEST_BUDGETS)'
+
+    endpoints = (
+        'api_donations_from',
+        'api_donations_to',
+        'api_consulting_agencies',
+        'api_consulting_clients',
+    )
+
+    def _create_actor(self):
+        actor = models.Organization.objects.create(name='Query budget check')
+        others = [models.Person.objects.create(name='Person {}'.format(i)) for i in range(5)]
+        others += [models.Organization.objects.create(name='Company {} Ltd'.format(i)) for i in range(5)]
+        for i, other in enumerate(others * 2):
+            for donor, recipient in ((other, actor), (actor, other)):
+                models.Donation.objects.create(
+                    donor=donor, recipient=recipient, value=100 + i, donation_type='Cash',
+                    reported_date=date(2015, 1, 1 + i), accounting_units_as_central_party=False,
+                    is_bequest=False, is_aggregation=False, is_sponsorship=False)
+            models.Consultancy.objects.create(client=other, agency=actor, start_date='2015-01-01', end_date='2015-03-31')
+            models.Consultancy.objects.create(client=actor, agency=other, start_date='2015-01-01', end_date='2015-03-31')
+        return actor
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        failures = []
+        try:
+            actor = self._create_actor()
+            client = Client()
+            for endpoint in self.endpoints:
+                url = reverse(endpoint, kwargs={'pk': actor.pk})
+                for params in ('', '?cursor=', '?sort=value&order=asc&offset=10'):
+                    if 'value' in params and 'consulting' in endpoint:
+                        params = '?sort=client&order=asc&offset=10'
+                    try:
+                        response = assert_endpoint_within_budget(client, url + params)
+                    except QueryBudgetExceeded as e:
+                        failures.append('{}{}\n{}'.format(url, params, e))
+                        continue
+                    if response.status_code != 200:
+                        raise CommandError('{}{} returned {}'.format(url, params, response.status_code))
+                print('Checked {}'.format(endpoint))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(failure)
+            raise CommandError('{} request(s) went over their query budget.'.format(len(failures)))
+        print('All requests are within their query budgets.')
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+
+from api import views
+from api.queryplans import QueryPlanError, check_index_backed
+from datafetch import models
+
+
+class Command(BaseCommand):
+    help = 'Check that every sort order of the relationship list endpoints uses an index'
+
+    endpoints = (
+        views.ActorReceivedDonationsFromListViewSet,
+        views.ActorDonatedToListViewSet,
+        views.ActorHasUsedAgenciesListViewSet,
+        views.ActorHasConsultedForListViewSet,
+    )
+
+    def _get_queryset(self, view_class, actor, params):
+        request = RequestFactory().get('/', params)
+        view = view_class()
+        view.request = view.initialize_request(request)
+        view.args = ()
+        view.kwargs = {'pk': actor.pk}
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        return view.get_queryset()[:page_size]
+
+    def _check_endpoint(self, view_class, actor):
+        failures = []
+        sorts = [None] + sorted(view_class.orderings)
+        for sort in sorts:
+            for order in ('asc', 'desc'):
+                params = {'sort': sort, 'order': order} if sort else {}
+                queryset = self._get_queryset(view_class, actor, params)
+                try:
+                    check_index_backed(queryset)
+                except QueryPlanError as e:
+                    failures.append('{} {}?{}\n{}'.format(view_class.__name__, sort, order, e))
+                if not sort:
+                    break
+        return failures
+
+    def handle(self, *args, **options):
+        # query plans depend on the schema rather than the data,
+        # so these are checked against an empty test database
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            actor = models.Organization.objects.create(name='Query plan check')
+            failures = []
+            for view_class in self.endpoints:
+                failures += self._check_endpoint(view_class, actor)
+                print('Checked {}'.format(view_class.__name__))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(failure)
+            raise CommandError('{} query plan(s) were not index-backed.'.format(len(failures)))
+        print('All query plans are index-backed.')
@@ -0,0 +1,198 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from datafetch.dataversion import get_data_version
+
+
+def cached_count(queryset):
+    """
+    COUNT(*) a queryset, caching the result (keyed on its SQL and the
+    data version) for API_COUNT_CACHE_TIMEOUT seconds.
+    """
+    queryset = queryset.order_by()
+    sql, params = queryset.query.sql_with_params()
+    version, _ = get_data_version()
+    key = 'api-count:' + hashlib.md5('{} {} {}'.format(version, sql, params).encode('utf8')).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.API_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def estimated_count(queryset):
+    """
+    The query planner's estimate of how many rows a queryset will
+    return. This is only available on PostgreSQL; on other databases
+    it falls back to `cached_count`.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return cached_count(queryset)
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        return cursor.fetchone()[0][0]['Plan']['Plan Rows']
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (or "seek") pagination. Each page is fetched by filtering on
+    the sort column and id of the last row seen, rather than by OFFSET,
+    so with an index on (filter column, sort column, id) fetching page
+    1000 costs the same as fetching page 1.
+
+    The view must provide `get_ordering()`, returning e.g.
+    ['-reported_date', '-id'] (the id always comes last).
+
+    The total is cached rather than counted on every page; pass
+    `count=estimate` for the (PostgreSQL) planner's estimate, or
+    `count=none` to skip it.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    limit_query_param = 'limit'
+    page_size = api_settings.PAGE_SIZE
+    max_limit = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.ordering = view.get_ordering()
+        self.field = queryset.model._meta.get_field(self.ordering[0].lstrip('-'))
+        self.count = self.get_count(queryset, request)
+
+        backwards, position = self.decode_cursor(request)
+        ordering = self.ordering
+        if backwards:
+            ordering = [x[1:] if x.startswith('-') else '-' + x for x in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek(queryset, ordering, *position))
+
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if backwards:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            if has_more or backwards:
+                self.next_position = self._position(rows[-1])
+            if (has_more and backwards) or (position is not None and not backwards):
+                self.previous_position = self._position(rows[0])
+        return rows
+
+    def _seek(self, queryset, ordering, value, pk):
+        """
+        A filter for the rows after (`value`, `pk`) in `ordering`.
+        """
+        name = self.field.name
+        descending = ordering[0].startswith('-')
+        op = 'lt' if descending else 'gt'
+        after_pk = Q(**{'id__{}'.format(op): pk})
+        # NULLs sort last in ascending order on PostgreSQL, and first
+        # on SQLite and MySQL
+        nulls_largest = connections[queryset.db].vendor == 'postgresql'
+        nulls_after = nulls_largest != descending
+        is_null = Q(**{'{}__isnull'.format(name): True})
+        if value is None:
+            if nulls_after:
+                return is_null & after_pk
+            return (is_null & after_pk) | ~is_null
+        seek = Q(**{'{}__{}'.format(name, op): value}) | (Q(**{name: value}) & after_pk)
+        if nulls_after:
+            seek |= is_null
+        return seek
+
+    def _position(self, row):
+        if isinstance(row, dict):
+            return row[self.field.attname], row['id']
+        return getattr(row, self.field.attname), row.id
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(limit, 1), self.max_limit)
+
+    def get_count(self, queryset, request):
+        method = request.query_params.get(self.count_query_param)
+        if method == 'none':
+            return None
+        if method == 'estimate':
+            return estimated_count(queryset)
+        return cached_count(queryset)
+
+    def encode_cursor(self, backwards, position):
+        token = json.dumps([backwards] + list(position), cls=DjangoJSONEncoder)
+        return urlsafe_b64encode(token.encode('utf8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        """
+        Return (backwards, (value, pk)) for the requested cursor; an
+        empty cursor means the first page.
+        """
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return False, None
+        try:
+            backwards, value, pk = json.loads(urlsafe_b64decode(token.encode('ascii')).decode('utf8'))
+            return bool(backwards), (value, int(pk))
+        except (TypeError, ValueError, binascii.Error):
+            raise ParseError('Invalid cursor')
+
+    def _link(self, backwards, position):
+        if position is None:
+            return None, None
+        cursor = self.encode_cursor(backwards, position)
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'offset')
+        return replace_query_param(url, self.cursor_query_param, cursor), cursor
+
+    def get_paginated_response(self, data):
+        next_link, next_cursor = self._link(False, self.next_position)
+        previous_link, previous_cursor = self._link(True, self.previous_position)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', next_link),
+            ('previous', previous_link),
+            ('next_cursor', next_cursor),
+            ('previous_cursor', previous_cursor),
+            ('results', data),
+        ]))
+
+
+class KeysetOrOffsetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination, unless the request includes a `cursor`
+    parameter (which may be empty, for the first page), in which case
+    `KeysetPagination` is used.
+    """
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super(KeysetOrOffsetPagination, self).paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super(KeysetOrOffsetPagination, self).get_paginated_response(data)
@@ -0,0 +1,68 @@
+"""
+Helpers for checking that a queryset is answered from an index,
+rather than by scanning and sorting the whole table.
+"""
+import re
+
+from django.db import connections, transaction
+
+
+class QueryPlanError(AssertionError):
+    pass
+
+
+def _pg_steps(node):
+    step = node['Node Type']
+    if node.get('Index Name'):
+        step += ' using {}'.format(node['Index Name'])
+    if node.get('Relation Name'):
+        step += ' on {}'.format(node['Relation Name'])
+    yield step
+    for child in node.get('Plans', []):
+        for step in _pg_steps(child):
+            yield step
+
+
+def explain(queryset):
+    """
+    Return the query plan for a queryset, as a list of strings
+    describing each step.
+    """
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    if connection.vendor == 'postgresql':
+        with transaction.atomic(using=queryset.db), connection.cursor() as cursor:
+            # make the planner use an index whenever there's a suitable
+            # one, so the plan doesn't depend on how much data there is
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        return list(_pg_steps(plan[0]['Plan']))
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+    raise NotImplementedError("Can't explain queries on {}".format(connection.vendor))
+
+
+def check_index_backed(queryset):
+    """
+    Raise QueryPlanError if the plan for a queryset involves a full
+    scan of its table or a separate sort step. Returns the plan.
+    """
+    table = re.escape(queryset.model._meta.db_table)
+    bad_steps = (
+        # postgresql
+        r'^Seq Scan on {}$'.format(table),
+        r'^Sort$',
+        # sqlite
+        r'^SCAN (TABLE )?{}\b'.format(table),
+        r'TEMP B-TREE FOR .*ORDER BY',
+    )
+    plan = explain(queryset)
+    problems = [step for step in plan if any(re.search(x, step) for x in bad_steps)]
+    if problems:
+        raise QueryPlanError('Query is not index-backed ({}):\n  {}'.format(
+            '; '.join(problems), '\n  '.join(plan)))
+    return plan
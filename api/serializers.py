@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 from rest_framework import serializers
 
 from datafetch import models
@@ -15,6 +17,14 @@ class MembershipSerializer(serializers.HyperlinkedModelSerializer):
         fields = ('role',)
 
 
+class RoleSerializer(serializers.Serializer):
+    role = serializers.CharField()
+    memberships = serializers.IntegerField()
+    people = serializers.IntegerField()
+    valid_from = serializers.DateField()
+    valid_until = serializers.DateField()
+
+
 class DonationSerializer(serializers.HyperlinkedModelSerializer):
     donor = ActorSerializer()
     recipient = ActorSerializer()
@@ -29,3 +39,90 @@ class ConsultancySerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = models.Consultancy
         fields = ('id', 'client', 'agency', 'source', 'start_date', 'end_date',)
+
+
+class ActorSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.ActorSummary
+        fields = ('donations_from_count', 'donations_from_total', 'donations_to_count', 'donations_to_total',
+                  'consulting_clients_count', 'consulting_agencies_count',)
+
+
+class ActorRankingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.ActorRanking
+        fields = ('actor',) + models.RANKING_SCORES
+
+
+class ActorSimilaritySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.ActorSimilarity
+        fields = ('similar', 'score', 'shared')
+
+
+class ValuesSerializer(serializers.BaseSerializer):
+    """
+    A read-only serializer giving exactly the output of `model_serializer`,
+    but for rows fetched with `.values(*columns())` rather than for model
+    instances. That's one joined query, with no model instantiation and
+    no per-field lookups.
+
+    Nested actors (`actor_fields`) are built from their id, name, kind
+    and slug columns; every other field is rendered by the corresponding
+    field of `model_serializer`.
+    """
+    model_serializer = None
+    actor_fields = ()
+
+    @classmethod
+    def columns(cls):
+        columns = []
+        for name in cls.model_serializer.Meta.fields:
+            if name in cls.actor_fields:
+                columns += ['{}_id'.format(name), '{}__name'.format(name), '{}__kind'.format(name), '{}__slug'.format(name)]
+            else:
+                columns.append(name)
+        return columns
+
+    def __init__(self, *args, **kwargs):
+        super(ValuesSerializer, self).__init__(*args, **kwargs)
+        fields = self.model_serializer().fields
+        self.plan = [(name, name in self.actor_fields, fields[name]) for name in self.model_serializer.Meta.fields]
+
+    def to_representation(self, row):
+        ret = OrderedDict()
+        for name, is_actor, field in self.plan:
+            if is_actor:
+                pk = row['{}_id'.format(name)]
+                if pk is None:
+                    ret[name] = None
+                    continue
+                ret[name] = OrderedDict([
+                    ('id', pk),
+                    ('name', row['{}__name'.format(name)]),
+                    ('url', models.actor_url(row['{}__kind'.format(name)], pk, row['{}__slug'.format(name)])),
+                ])
+            else:
+                value = row[name]
+                ret[name] = None if value is None else field.to_representation(value)
+        return ret
+
+
+class DonationValuesSerializer(ValuesSerializer):
+    model_serializer = DonationSerializer
+    actor_fields = ('donor', 'recipient')
+
+
+class ConsultancyValuesSerializer(ValuesSerializer):
+    model_serializer = ConsultancySerializer
+    actor_fields = ('client', 'agency')
+
+
+class ActorRankingValuesSerializer(ValuesSerializer):
+    model_serializer = ActorRankingSerializer
+    actor_fields = ('actor',)
+
+
+class ActorSimilarityValuesSerializer(ValuesSerializer):
+    model_serializer = ActorSimilaritySerializer
+    actor_fields = ('similar',)
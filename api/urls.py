@@ -1,4 +1,5 @@
 from django.conf.urls import url, include
+from django.views.decorators.gzip import gzip_page
 from rest_framework import routers
 from api import views
 
@@ -11,13 +12,24 @@ router = routers.DefaultRouter()
 urlpatterns = [
     url(r'^', include(router.urls)),
 
-    url(r'^actors', views.ActorViewSet.as_view(), name='api_actors'),
-    url(r'^politicians', views.PoliticianViewSet.as_view(), name='api_politicians'),
-    url(r'^memberships', views.MembershipViewSet.as_view(), name='api_memberships'),
+    url(r'^actors$', views.ActorViewSet.as_view(), name='api_actors'),
+    url(r'^actors/autocomplete$', views.ActorAutocompleteView.as_view(), name='api_actor_autocomplete'),
+    url(r'^politicians$', views.PoliticianViewSet.as_view(), name='api_politicians'),
+    url(r'^memberships$', views.MembershipViewSet.as_view(), name='api_memberships'),
 
-    url(r'^actors/(?P<pk>\d+)/donations-from', views.ActorReceivedDonationsFromListViewSet.as_view(), name='api_donations_from'),
-    url(r'^actors/(?P<pk>\d+)/donations-to', views.ActorDonatedToListViewSet.as_view(), name='api_donations_to'),
+    url(r'^actors/(?P<pk>\d+)/bundle$', views.ActorBundleView.as_view(), name='api_actor_bundle'),
+    url(r'^actors/(?P<pk>\d+)/path/(?P<other_pk>\d+)$', views.ActorPathView.as_view(), name='api_actor_path'),
+    url(r'^actors/(?P<pk>\d+)/neighbourhood$', views.ActorNeighbourhoodView.as_view(), name='api_actor_neighbourhood'),
+    url(r'^actors/(?P<pk>\d+)/similar$', views.ActorSimilarView.as_view(), name='api_actor_similar'),
 
-    url(r'^actors/(?P<pk>\d+)/consulting-agencies', views.ActorHasUsedAgenciesListViewSet.as_view(), name='api_consulting_agencies'),
-    url(r'^actors/(?P<pk>\d+)/consulting-clients', views.ActorHasConsultedForListViewSet.as_view(), name='api_consulting_clients'),
+    url(r'^actors/(?P<pk>\d+)/donations-from$', views.ActorReceivedDonationsFromListViewSet.as_view(), name='api_donations_from'),
+    url(r'^actors/(?P<pk>\d+)/donations-to$', views.ActorDonatedToListViewSet.as_view(), name='api_donations_to'),
+
+    url(r'^actors/(?P<pk>\d+)/consulting-agencies$', views.ActorHasUsedAgenciesListViewSet.as_view(), name='api_consulting_agencies'),
+    url(r'^actors/(?P<pk>\d+)/consulting-clients$', views.ActorHasConsultedForListViewSet.as_view(), name='api_consulting_clients'),
+
+    url(r'^donations/totals$', views.DonationTotalsView.as_view(), name='api_donation_totals'),
+    url(r'^rankings$', views.RankingView.as_view(), name='api_rankings'),
+
+    url(r'^export/(?P<kind>donations|consultancies)\.(?P<fmt>csv|ndjson)$', gzip_page(views.ExportView.as_view()), name='api_export'),
 ]
@@ -1,44 +1,135 @@
+from collections import OrderedDict
+
+from django.core.urlresolvers import reverse
 from django.shortcuts import get_object_or_404
-from django.db.models import Prefetch, Q
+from django.http import Http404, StreamingHttpResponse
 from rest_framework import viewsets, permissions, generics
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from api import aggregates, export, serializers
+from api.cache import ResponseCacheMixin
+from api.pagination import KeysetOrOffsetPagination, KeysetPagination
+from datafetch import graph, models
+from datafetch.dataversion import DataVersionConditionMixin
+from datafetch.graph import get_influence_graph
+from datafetch.intervals import get_membership_index
+from datafetch.typeahead import MAX_RESULTS, get_typeahead_index
+from datafetch.models.popolo.behaviors import partial_date_bounds
+from datafetch.models.popolo.querysets import parse_moment
+from undertheinfluence.instrumentation import timer
 
-from api import serializers
-from datafetch import models
+
+# The most ids passed to a query as parameters at once (SQLite allows
+# 999 parameters per query)
+MAX_ID_PARAMS = 500
 
 
 class DonationViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint that allows users to be viewed or edited.
     """
-    queryset = models.Donation.objects.all().order_by('-received_date')
+    queryset = models.Donation.objects.select_related('donor', 'recipient').order_by('-received_date', '-id')
     serializer_class = serializers.DonationSerializer
+    pagination_class = KeysetOrOffsetPagination
+
+    def get_ordering(self):
+        return ['-received_date', '-id']
+
+
+# Sort keys accepted by the relationship lists, mapped to orderings
+# that are backed by an (actor, column, id) index. See the
+# index_together on Donation and Consultancy.
+DONATION_ORDERINGS = {
+    'value': 'value',
+    'donor': 'donor',
+    'recipient': 'recipient',
+    'nature_of_donation': 'nature_of_donation',
+    'donation_type': 'donation_type',
+    'accepted_date': 'accepted_date',
+    'reported_date': 'reported_date',
+}
+
+CONSULTANCY_ORDERINGS = {
+    'client': 'client',
+    'agency': 'agency',
+    'start_date': 'valid_from',
+    'end_date': 'valid_until',
+}
+
+
+def relationship_values(actor, fk, serializer_class, ordering, descendants=False):
+    """
+    The relationship lists fetch just the columns their (values)
+    serializer needs, in one joined query. The sort column is needed
+    too, for keyset pagination. With `descendants`, the relationships
+    of the organizations under `actor` are included.
+    """
+    columns = serializer_class.columns()
+    if ordering[0].lstrip('-') not in columns:
+        columns.append(ordering[0].lstrip('-'))
+    if descendants:
+        relation = models.Actor._meta.get_field(fk)
+        queryset = relation.related_model.objects.filter(models.subtree_q(relation.field.name, actor.id))
+    else:
+        queryset = getattr(actor, fk).all()
+    return queryset.order_by(*ordering).values(*columns)
+
+
+def _flag(request, param):
+    return request.query_params.get(param, '').lower() in ('1', 'true', 'yes')
 
 
-class InfluenceListViewSet(generics.ListAPIView):
+class InfluenceListViewSet(DataVersionConditionMixin, ResponseCacheMixin, generics.ListAPIView):
     # permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
 
-    def apply_filters(self, fk, search_field):
-        actor = get_object_or_404(models.Actor, pk=self.kwargs['pk'])
-        queryset = getattr(actor, fk)
+    # sort key -> indexed field
+    orderings = {}
+    # (field, descending) used when no sort is requested
+    default_ordering = None
 
-        search = self.request.query_params.get('search')
-        if search:
-            query = {'{}__icontains'.format(search_field): search}
-            queryset = queryset.filter(**query)
+    def get_ordering(self):
         sort = self.request.query_params.get('sort')
         if sort:
-            # if sort == 'donor':
-            #     sort = 'donor__name'
-            order = '-' if self.request.query_params.get('order') == 'desc' else ''
-            queryset = queryset.order_by(order + sort)
-        return queryset.all()
+            field = self.orderings.get(sort)
+            if field is None:
+                raise ParseError("Unable to sort by '{}'".format(sort))
+            descending = self.request.query_params.get('order') == 'desc'
+        else:
+            field, descending = self.default_ordering
+        order = '-' if descending else ''
+        # id breaks ties, so the ordering is stable between pages
+        return [order + field, order + 'id']
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        with timer(request, 'serialization_time'):
+            data = self.get_serializer(page, many=True).data
+        return self.get_paginated_response(data)
+
+    def apply_filters(self, fk, relationship, counterpart):
+        actor = get_object_or_404(models.Actor.objects.non_polymorphic(), pk=self.kwargs['pk'])
+        # ?descendants=true includes the organizations under the actor
+        descendants = _flag(self.request, 'descendants')
+        queryset = relationship_values(actor, fk, self.serializer_class, self.get_ordering(), descendants)
+
+        search = self.request.query_params.get('search')
+        if search:
+            # matched against the counterparts' normalised names
+            # (see RelationshipToken)
+            queryset = models.filter_by_counterpart(queryset, actor.id, relationship, counterpart, search,
+                                                    descendants=descendants)
+        return queryset
 
 
 class ActorViewSet(InfluenceListViewSet):
     serializer_class = serializers.ActorSerializer
 
     def get_queryset(self):
-        queryset = models.Actor.objects.all()
+        queryset = models.Actor.objects.non_polymorphic()
         search = self.request.query_params.get('search')
         if search is not None:
             queryset = queryset.filter(name__icontains=search)
@@ -49,56 +140,445 @@ class PoliticianViewSet(InfluenceListViewSet):
     serializer_class = serializers.ActorSerializer
 
     def get_queryset(self):
-        queryset = models.Person.objects.filter(memberships__isnull=False).distinct().order_by('name').prefetch_related(Prefetch('memberships'))
-        search = self.request.query_params.get('search')
-        if search is not None:
-            queryset = queryset.filter(name__icontains=search)
+        # who held a role on a date comes from the in-memory membership
+        # index, rather than joining through Membership (which is used
+        # as a subquery otherwise, and when there are too many holders
+        # to pass in as parameters)
         role = self.request.query_params.get('role')
+        date = None
         if role is not None:
-            k = { "memberships__role": role }
             date = self.request.query_params.get('date')
             if date is not None:
-                k["memberships__start_date__lte"] = date
-                queryset = queryset.filter(Q(memberships__end_date__gte=date, **k) | Q(memberships__end_date__isnull=True, **k))
+                try:
+                    date = parse_moment(date)
+                except ValueError:
+                    raise ParseError("Invalid date: '{}'".format(date))
+        memberships = models.Membership.objects.all()
+        if role is not None:
+            memberships = memberships.filter(role=role)
+        person_ids = memberships.values('person_id')
+        if date is not None:
+            holders = get_membership_index().holders(role, date)
+            if len(holders) <= MAX_ID_PARAMS:
+                person_ids = holders
             else:
-                queryset = queryset.filter(**k)
+                person_ids = memberships.current(date).values('person_id')
+
+        queryset = models.Person.objects.filter(id__in=person_ids).order_by('name')
+        search = self.request.query_params.get('search')
+        if search is not None:
+            queryset = queryset.filter(name__icontains=search)
         return queryset
 
 
 class MembershipViewSet(InfluenceListViewSet):
-    serializer_class = serializers.MembershipSerializer
+    serializer_class = serializers.RoleSerializer
 
     def get_queryset(self):
-        queryset = models.Membership.objects.distinct('role')
-        search = self.request.query_params.get('search')
-        if search is not None:
-            queryset = queryset.filter(role__icontains=search)
-        return queryset
+        # the distinct roles come from the in-memory role catalogue
+        return get_membership_index().find_roles(self.request.query_params.get('search'))
 
 
 class ActorReceivedDonationsFromListViewSet(InfluenceListViewSet):
-    serializer_class = serializers.DonationSerializer
+    serializer_class = serializers.DonationValuesSerializer
+    orderings = DONATION_ORDERINGS
+    default_ordering = ('reported_date', True)
+    pagination_class = KeysetOrOffsetPagination
 
     def get_queryset(self):
-        return self.apply_filters("received_donations_from", search_field="donor__name")
+        return self.apply_filters("received_donations_from", relationship="donations_from", counterpart="donor")
 
 
 class ActorDonatedToListViewSet(InfluenceListViewSet):
-    serializer_class = serializers.DonationSerializer
+    serializer_class = serializers.DonationValuesSerializer
+    orderings = DONATION_ORDERINGS
+    default_ordering = ('reported_date', True)
+    pagination_class = KeysetOrOffsetPagination
 
     def get_queryset(self):
-        return self.apply_filters("donated_to", search_field="recipient__name")
+        return self.apply_filters("donated_to", relationship="donations_to", counterpart="recipient")
 
 
 class ActorHasUsedAgenciesListViewSet(InfluenceListViewSet):
-    serializer_class = serializers.ConsultancySerializer
+    serializer_class = serializers.ConsultancyValuesSerializer
+    orderings = CONSULTANCY_ORDERINGS
+    default_ordering = ('valid_until', True)
+    pagination_class = KeysetOrOffsetPagination
 
     def get_queryset(self):
-        return self.apply_filters("consulting_agencies", search_field="agency__name")
+        return self.apply_filters("consulting_agencies", relationship="consulting_agencies", counterpart="agency")
 
 
 class ActorHasConsultedForListViewSet(InfluenceListViewSet):
-    serializer_class = serializers.ConsultancySerializer
+    serializer_class = serializers.ConsultancyValuesSerializer
+    orderings = CONSULTANCY_ORDERINGS
+    default_ordering = ('valid_until', True)
+    pagination_class = KeysetOrOffsetPagination
 
     def get_queryset(self):
-        return self.apply_filters("consulting_clients", search_field="client__name")
+        return self.apply_filters("consulting_clients", relationship="consulting_clients", counterpart="client")
+
+
+class ActorBundleView(DataVersionConditionMixin, ResponseCacheMixin, generics.GenericAPIView):
+    """
+    Everything the actor page loads, in one response: the actor, their
+    relationship counts and donation totals, and the first page of each
+    of their non-empty relationship lists (as the list endpoint would
+    return it with its default sort, and a cursor for the next page).
+
+    The counts come from ActorSummary, so this is at most five queries
+    however many relationships the actor has.
+    """
+    queryset = models.Actor.objects.non_polymorphic().select_related('relationship_summary')
+
+    # name -> (related name, list view, URL name)
+    relationships = OrderedDict([
+        ('donations_to', ('donated_to', ActorDonatedToListViewSet, 'api_donations_to')),
+        ('donations_from', ('received_donations_from', ActorReceivedDonationsFromListViewSet, 'api_donations_from')),
+        ('consulting_agencies', ('consulting_agencies', ActorHasUsedAgenciesListViewSet, 'api_consulting_agencies')),
+        ('consulting_clients', ('consulting_clients', ActorHasConsultedForListViewSet, 'api_consulting_clients')),
+    ])
+
+    def get(self, request, pk):
+        actor = get_object_or_404(self.get_queryset(), pk=pk)
+        try:
+            summary = actor.relationship_summary
+        except models.ActorSummary.DoesNotExist:
+            summary = models.ActorSummary(actor_id=actor.id)
+        counts = summary.relationships()
+
+        paginator = KeysetPagination()
+        limit = paginator.get_limit(request)
+        relationships = OrderedDict()
+        for name, (fk, view_class, url_name) in self.relationships.items():
+            if not counts[name]:
+                continue
+            serializer_class = view_class.serializer_class
+            field, descending = view_class.default_ordering
+            order = '-' if descending else ''
+            rows = list(relationship_values(actor, fk, serializer_class, [order + field, order + 'id'])[:limit + 1])
+
+            url = request.build_absolute_uri(reverse(url_name, kwargs={'pk': actor.id}))
+            next_link = next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                attname = serializer_class.model_serializer.Meta.model._meta.get_field(field).attname
+                next_cursor = paginator.encode_cursor(False, (rows[-1][attname], rows[-1]['id']))
+                next_link = replace_query_param(url, paginator.cursor_query_param, next_cursor)
+            with timer(request, 'serialization_time'):
+                results = serializer_class(rows, many=True).data
+            relationships[name] = OrderedDict([
+                ('count', counts[name]),
+                ('url', url),
+                ('next', next_link),
+                ('next_cursor', next_cursor),
+                ('results', results),
+            ])
+
+        return Response(OrderedDict([
+            ('actor', OrderedDict([
+                ('id', actor.id),
+                ('name', actor.name),
+                ('url', models.actor_url(actor.kind, actor.id, actor.slug)),
+            ])),
+            ('summary', serializers.ActorSummarySerializer(summary).data),
+            ('limit', limit),
+            ('relationships', relationships),
+        ]))
+
+
+class ActorAutocompleteView(DataVersionConditionMixin, generics.GenericAPIView):
+    """
+    The actors whose names (or other names) best match what's been
+    typed so far, e.g. /api/actors/autocomplete?q=lab&limit=5, with
+    their relationship counts. This is answered from an in-memory
+    trigram index, so it doesn't touch the database.
+    """
+    queryset = models.Actor.objects.all()
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', api_settings.PAGE_SIZE))
+        except ValueError:
+            raise ParseError("Invalid limit: '{}'".format(request.query_params['limit']))
+        limit = min(max(limit, 1), MAX_RESULTS)
+
+        matches = get_typeahead_index().complete(request.query_params.get('q', ''), limit=limit)
+        return Response(OrderedDict([
+            ('results', [OrderedDict([
+                ('id', match.actor_id),
+                ('name', match.name),
+                ('kind', match.kind),
+                ('url', models.actor_url(match.kind, match.actor_id, match.slug)),
+                ('matched', match.matched),
+                ('relationships', match.relationships),
+            ]) for match in matches]),
+        ]))
+
+
+class RankingView(DataVersionConditionMixin, ResponseCacheMixin, generics.ListAPIView):
+    """
+    Actors ranked by one of their network scores (see ActorRanking),
+    highest first, e.g. /api/rankings?sort=influence&kind=organization.
+    Pass order=asc for lowest first.
+    """
+    serializer_class = serializers.ActorRankingValuesSerializer
+    pagination_class = KeysetOrOffsetPagination
+    default_sort = 'pagerank'
+
+    def get_ordering(self):
+        sort = self.request.query_params.get('sort', self.default_sort)
+        if sort not in models.RANKING_SCORES:
+            raise ParseError("Unable to sort by '{}'".format(sort))
+        order = '' if self.request.query_params.get('order') == 'asc' else '-'
+        return [order + sort, order + 'id']
+
+    def get_queryset(self):
+        queryset = models.ActorRanking.objects.all()
+        kind = self.request.query_params.get('kind')
+        if kind:
+            if kind not in models.Actor.KINDS:
+                raise ParseError("Invalid kind: '{}'".format(kind))
+            queryset = queryset.filter(kind=kind)
+        columns = self.serializer_class.columns() + ['id']
+        return queryset.order_by(*self.get_ordering()).values(*columns)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        with timer(request, 'serialization_time'):
+            data = self.get_serializer(page, many=True).data
+        return self.get_paginated_response(data)
+
+
+def _graph_params(request, default_hops, max_hops):
+    """
+    The `hops` and `relationships` (comma-separated, any of
+    graph.RELATIONSHIPS) query parameters.
+    """
+    try:
+        hops = int(request.query_params.get('hops', default_hops))
+    except ValueError:
+        raise ParseError("Invalid hops: '{}'".format(request.query_params['hops']))
+    if not 1 <= hops <= max_hops:
+        raise ParseError('hops should be between 1 and {}'.format(max_hops))
+    relationships = request.query_params.get('relationships')
+    if relationships:
+        relationships = relationships.split(',')
+        for relationship in relationships:
+            if relationship not in graph.RELATIONSHIPS:
+                raise ParseError("Unknown relationship: '{}'".format(relationship))
+    return hops, relationships or None
+
+
+def _graph_actors(actor_ids):
+    """
+    {actor id: {id, name, kind, url}} for `actor_ids`, in a query per
+    MAX_ID_PARAMS of them.
+    """
+    actor_ids = sorted(set(actor_ids))
+    actors = {}
+    for idx in range(0, len(actor_ids), MAX_ID_PARAMS):
+        rows = models.Actor.objects.non_polymorphic().filter(
+            id__in=actor_ids[idx:idx + MAX_ID_PARAMS]).values_list('id', 'name', 'kind', 'slug')
+        actors.update((pk, OrderedDict([
+            ('id', pk),
+            ('name', name),
+            ('kind', kind),
+            ('url', models.actor_url(kind, pk, slug)),
+        ])) for pk, name, kind, slug in rows)
+    return actors
+
+
+class ActorPathView(DataVersionConditionMixin, ResponseCacheMixin, generics.GenericAPIView):
+    """
+    How two actors are connected, e.g. /api/actors/1/path/2?hops=4: a
+    shortest chain of donations, consultancies and memberships between
+    them (in either direction), or null if there isn't one within
+    `hops`. This is answered from the in-memory influence graph.
+    """
+    queryset = models.Actor.objects.all()
+
+    def get(self, request, pk, other_pk):
+        hops, relationships = _graph_params(request, graph.MAX_HOPS, graph.MAX_HOPS)
+        pk, other_pk = int(pk), int(other_pk)
+        steps = get_influence_graph().path(pk, other_pk, max_hops=hops, relationships=relationships)
+        path = [pk]
+        for step in steps or []:
+            path.append(step.target if step.source == path[-1] else step.source)
+        actors = _graph_actors(path + [other_pk])
+        if pk not in actors or other_pk not in actors:
+            raise Http404
+        return Response(OrderedDict([
+            ('actors', [actors[x] for x in (pk, other_pk)]),
+            ('hops', None if steps is None else len(steps)),
+            ('path', None if steps is None else [OrderedDict([
+                ('source', actors[step.source]),
+                ('relationship', step.relationship),
+                ('target', actors[step.target]),
+                ('weight', step.weight),
+            ]) for step in steps]),
+        ]))
+
+
+class ActorNeighbourhoodView(DataVersionConditionMixin, ResponseCacheMixin, generics.GenericAPIView):
+    """
+    The actors within `hops` (by default 2) donations, consultancies or
+    memberships of an actor, nearest first, e.g.
+    /api/actors/1/neighbourhood?hops=3&relationships=donation. This is
+    answered from the in-memory influence graph.
+    """
+    queryset = models.Actor.objects.all()
+    max_hops = 3
+
+    def get(self, request, pk):
+        hops, relationships = _graph_params(request, 2, self.max_hops)
+        try:
+            limit = int(request.query_params.get('limit', graph.MAX_NEIGHBOURS))
+        except ValueError:
+            raise ParseError("Invalid limit: '{}'".format(request.query_params['limit']))
+        limit = min(max(limit, 1), graph.MAX_NEIGHBOURS)
+
+        pk = int(pk)
+        neighbours, truncated = get_influence_graph().neighbourhood(
+            pk, hops=hops, relationships=relationships, limit=limit)
+        actors = _graph_actors([pk] + list(neighbours))
+        if pk not in actors:
+            raise Http404
+        results = []
+        for actor_id, distance in neighbours.items():
+            actor = actors.get(actor_id)
+            if actor is not None:
+                results.append(OrderedDict(actor, hops=distance))
+        return Response(OrderedDict([
+            ('actor', actors[pk]),
+            ('hops', hops),
+            ('truncated', truncated),
+            ('results', results),
+        ]))
+
+
+class ActorSimilarView(DataVersionConditionMixin, ResponseCacheMixin, generics.GenericAPIView):
+    """
+    The actors most similar to an actor by who they've donated with (see
+    ActorSimilarity), best first: the donors who also gave to its
+    recipients, and the recipients who were also given to by its donors,
+    e.g. /api/actors/1/similar?role=donor.
+    """
+    queryset = models.ActorSimilarity.objects.all()
+    serializer_class = serializers.ActorSimilarityValuesSerializer
+
+    def get(self, request, pk):
+        roles = [value for value, label in models.ActorSimilarity.ROLES]
+        role = request.query_params.get('role')
+        if role:
+            if role not in roles:
+                raise ParseError("Invalid role: '{}'".format(role))
+            roles = [role]
+        actors = _graph_actors([int(pk)])
+        if not actors:
+            raise Http404
+        similarities = (self.get_queryset().filter(actor_id=pk, role__in=roles).order_by('role', '-score', 'similar_id')
+                        .values(*self.serializer_class.columns() + ['role']))
+        results = OrderedDict((role, []) for role in sorted(roles))
+        serializer = self.get_serializer()
+        for similarity in similarities:
+            results[similarity['role']].append(serializer.to_representation(similarity))
+        return Response(OrderedDict([('actor', actors[int(pk)])] + [
+            ('{}s'.format(role), similar) for role, similar in results.items()
+        ]))
+
+
+class ExportView(DataVersionConditionMixin, generics.GenericAPIView):
+    """
+    Stream every donation or consultancy (optionally filtered by actor
+    and date) as CSV or newline-delimited JSON, in one sequential scan.
+    """
+    # kind -> (model, values serializer, date field)
+    exports = {
+        'donations': (models.Donation, serializers.DonationValuesSerializer, 'reported_date'),
+        'consultancies': (models.Consultancy, serializers.ConsultancyValuesSerializer, 'valid_from'),
+    }
+    formats = {
+        'csv': (export.stream_csv, 'text/csv; charset=utf-8'),
+        'ndjson': (export.stream_ndjson, 'application/x-ndjson; charset=utf-8'),
+    }
+
+    def get_queryset(self):
+        model, serializer_class, date_field = self.exports[self.kwargs['kind']]
+        queryset = model.objects.all()
+        for fk in serializer_class.actor_fields:
+            pk = self.request.query_params.get(fk)
+            if pk is not None:
+                if not pk.isdigit():
+                    raise ParseError("Invalid {}: '{}'".format(fk, pk))
+                queryset = queryset.filter(**{'{}_id'.format(fk): pk})
+        # partial dates cover their whole year or month
+        for param, lookup, bound in (('since', 'gte', 0), ('until', 'lte', 1)):
+            date = self.request.query_params.get(param)
+            if date is not None:
+                try:
+                    date = partial_date_bounds(date)[bound]
+                except ValueError:
+                    raise ParseError("Invalid date: '{}'".format(date))
+                # (an empty date doesn't filter)
+                if date is not None:
+                    queryset = queryset.filter(**{'{}__{}'.format(date_field, lookup): date})
+        return queryset
+
+    def get(self, request, kind, fmt):
+        stream, content_type = self.formats[fmt]
+        serializer_class = self.exports[kind][1]
+        response = StreamingHttpResponse(stream(self.get_queryset(), serializer_class), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(kind, fmt)
+        return response
+
+
+class DonationTotalsView(DataVersionConditionMixin, ResponseCacheMixin, generics.GenericAPIView):
+    """
+    Donation counts, totals and percentiles, e.g.
+    /api/donations/totals?group_by=year,donation_type&recipient=123
+
+    Grouped by any of recipient or donor, year, quarter or month,
+    donation_type and nature_of_donation, and filtered by recipient
+    or donor (an actor id, and with descendants=true, the
+    organizations under it), since, until and donation_type.
+    """
+    queryset = models.DonationRollup.objects.all()
+
+    def get(self, request):
+        params = request.query_params
+        group_by = [x for x in params.get('group_by', '').split(',') if x]
+
+        role = actor = None
+        for param in aggregates.ACTOR_DIMENSIONS:
+            if param in params:
+                if role:
+                    raise ParseError('Donations can be filtered by recipient or by donor, but not both')
+                role, actor = param, params[param]
+                if not actor.isdigit():
+                    raise ParseError("Invalid {}: '{}'".format(param, actor))
+
+        dates = {}
+        for param, bound in (('since', 0), ('until', 1)):
+            try:
+                dates[param] = partial_date_bounds(params.get(param))[bound]
+            except ValueError:
+                raise ParseError("Invalid date: '{}'".format(params[param]))
+
+        try:
+            percentiles = [int(x) for x in params.get('percentiles', '50,90').split(',') if x]
+        except ValueError:
+            percentiles = None
+        if percentiles is None or any(p < 0 or p > 100 for p in percentiles):
+            raise ParseError('Percentiles should be whole numbers between 0 and 100')
+
+        try:
+            results = aggregates.donation_totals(
+                group_by, actor=actor, role=role, donation_type=params.get('donation_type'),
+                percentiles=percentiles, descendants=_flag(request, 'descendants'), **dates)
+        except aggregates.AggregateError as e:
+            raise ParseError(str(e))
+        return Response(OrderedDict([
+            ('group_by', group_by),
+            ('results', results),
+        ]))
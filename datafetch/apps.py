@@ -4,3 +4,32 @@ from django.apps import AppConfig
 class DataFetchConfig(AppConfig):
     name = 'datafetch'
     verbose_name = "Data Fetch"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save, pre_save
+        from datafetch import models, receivers
+        from datafetch.graph import clear_influence_graph
+        from datafetch.intervals import clear_membership_index
+        from datafetch.models.hierarchies import check_parent, update_closure
+        from datafetch.signals import import_finished
+        from datafetch.typeahead import clear_typeahead_index
+        import_finished.connect(receivers.refresh_rollups, dispatch_uid='datafetch.receivers.refresh_rollups')
+        import_finished.connect(receivers.refresh_summaries, dispatch_uid='datafetch.receivers.refresh_summaries')
+        import_finished.connect(receivers.update_search, dispatch_uid='datafetch.receivers.update_search')
+        import_finished.connect(receivers.refresh_rankings, dispatch_uid='datafetch.receivers.refresh_rankings')
+        import_finished.connect(receivers.refresh_similarities,
+                                dispatch_uid='datafetch.receivers.refresh_similarities')
+        import_finished.connect(receivers.refresh_hierarchies,
+                                dispatch_uid='datafetch.receivers.refresh_hierarchies')
+        for sender in (models.Organization, models.Area):
+            pre_save.connect(check_parent, sender=sender, dispatch_uid='datafetch.models.hierarchies.check_parent')
+            post_save.connect(update_closure, sender=sender, dispatch_uid='datafetch.models.hierarchies.update_closure')
+        for signal in (post_save, post_delete):
+            signal.connect(clear_membership_index, sender=models.Membership,
+                           dispatch_uid='datafetch.intervals.clear_membership_index')
+            for sender in (models.Person, models.Organization, models.OtherName):
+                signal.connect(clear_typeahead_index, sender=sender,
+                               dispatch_uid='datafetch.typeahead.clear_typeahead_index')
+            for sender in (models.Donation, models.Consultancy, models.Membership):
+                signal.connect(clear_influence_graph, sender=sender,
+                               dispatch_uid='datafetch.graph.clear_influence_graph')
@@ -0,0 +1,168 @@
+"""
+A small benchmark harness for the import pipeline and the API
+(see BENCHMARK_MODULES).
+
+Each benchmark is a function that sets up a `Workload` against fixed
+local fixtures. The harness runs the workload inside a transaction
+that is always rolled back, and records:
+
+ * wall_time - median seconds per run
+ * queries - SQL queries issued per run
+ * rows_per_sec - fixture rows processed per second
+ * peak_memory - peak bytes allocated during a run (via tracemalloc)
+
+Results are compared against a stored baseline, so that changes to
+the import path which (say) bring back per-row queries get noticed.
+"""
+from collections import namedtuple, OrderedDict
+from contextlib import redirect_stdout
+import gc
+from importlib import import_module
+import io
+import json
+from os.path import dirname, join
+import statistics
+import time
+import tracemalloc
+
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+BASELINE_PATH = join(dirname(__file__), 'baseline.json')
+FIXTURES_DIR = join(dirname(__file__), 'fixtures')
+
+# metric name -> direction (1 if bigger is worse, -1 if smaller is worse)
+METRICS = OrderedDict([
+    ('wall_time', 1),
+    ('queries', 1),
+    ('rows_per_sec', -1),
+    ('peak_memory', 1),
+])
+
+# `run` is called with no arguments; `rows` is the number of
+# fixture rows it processes
+Workload = namedtuple('Workload', ['run', 'rows'])
+
+# modules that register benchmarks when imported
+BENCHMARK_MODULES = (
+    'datafetch.benchmarks.importers',
+    'api.benchmarks',
+)
+
+# name -> (suite, setup function)
+BENCHMARKS = OrderedDict()
+
+
+def register(suite, name):
+    """
+    Register a benchmark. The decorated function is called (inside
+    the benchmark transaction, but outside the timed section) and
+    should return a `Workload`.
+    """
+    def decorator(func):
+        BENCHMARKS[name] = (suite, func)
+        return func
+    return decorator
+
+
+def fixture_path(filename):
+    return join(FIXTURES_DIR, filename)
+
+
+def _run_once(setup, trace_memory=False):
+    with transaction.atomic():
+        workload = setup()
+        gc.collect()
+        # the query log is a bounded deque, so it needs emptying
+        # for the captured count to be accurate
+        reset_queries()
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as ctx, redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                workload.run()
+                wall_time = time.perf_counter() - start
+            peak_memory = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+            transaction.set_rollback(True)
+    return workload.rows, wall_time, len(ctx.captured_queries), peak_memory
+
+
+def run_benchmark(name, repeat=3):
+    suite, setup = BENCHMARKS[name]
+    timings = []
+    for _ in range(repeat):
+        rows, wall_time, queries, _ = _run_once(setup)
+        timings.append(wall_time)
+    # memory is measured on a separate run, since tracing
+    # allocations slows everything else down
+    _, _, _, peak_memory = _run_once(setup, trace_memory=True)
+
+    wall_time = statistics.median(timings)
+    return OrderedDict([
+        ('suite', suite),
+        ('rows', rows),
+        ('wall_time', round(wall_time, 4)),
+        ('queries', queries),
+        ('rows_per_sec', round(rows / wall_time, 1) if wall_time else None),
+        ('peak_memory', peak_memory),
+    ])
+
+
+def run_benchmarks(names=None, suite=None, repeat=3):
+    for module in BENCHMARK_MODULES:
+        import_module(module)
+
+    results = OrderedDict()
+    for name, (bench_suite, _) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        if suite and bench_suite != suite:
+            continue
+        results[name] = run_benchmark(name, repeat=repeat)
+    return results
+
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=4, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results, baseline, thresholds):
+    """
+    Return a list of (benchmark name, metric, baseline value,
+    current value) for every metric that has regressed by more
+    than its threshold (a fraction of the baseline value).
+    """
+    regressions = []
+    for name, result in results.items():
+        stored = baseline.get(name)
+        if not stored:
+            continue
+        for metric, direction in METRICS.items():
+            threshold = thresholds.get(metric)
+            old, new = stored.get(metric), result.get(metric)
+            if threshold is None or old is None or new is None:
+                continue
+            if direction > 0:
+                regressed = new > old * (1 + threshold)
+            else:
+                regressed = new < old * (1 - threshold)
+            if regressed:
+                regressions.append((name, metric, old, new))
+    return regressions
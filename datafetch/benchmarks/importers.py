@@ -0,0 +1,64 @@
+"""
+Benchmarks for the processing stage of each importer, run against
+the fixtures in `datafetch/benchmarks/fixtures` (so nothing is
+fetched over the network).
+"""
+import json
+
+from datafetch import helpers
+from datafetch.benchmarks import Workload, fixture_path, register
+from datafetch.management.commands import import_appc, import_ec, import_parlparse
+
+
+def _read_ec_csv(filename):
+    with open(fixture_path(filename)) as f:
+        return helpers.parse_ec_csv(f)
+
+
+@register('importers', 'import_ec._process_donations')
+def ec_donations():
+    donations = _read_ec_csv('ec_donations.csv')
+    registered_entities = _read_ec_csv('ec_registrations.csv')
+
+    command = import_ec.Command()
+    command.refresh = False
+    command.registered_entities_dict = {v['regulated_entity_name']: v for v in registered_entities}
+    return Workload(lambda: command._process_donations(donations), len(donations))
+
+
+@register('importers', 'import_parlparse._process_people')
+def parlparse_people():
+    with open(fixture_path('parlparse_people.json')) as f:
+        j = json.load(f)
+
+    command = import_parlparse.Command()
+    command.refresh = False
+
+    def run():
+        # mirrors the processing in `import_parlparse.Command.handle`
+        j['persons'] = command._process_people(j['persons'])
+        j['organizations'] = command._process_organizations(j['organizations'])
+        j['posts'] = command._process_posts(j['posts'], j)
+        command._process_memberships(j['memberships'], j)
+
+    return Workload(run, len(j['persons']) + len(j['memberships']))
+
+
+@register('importers', 'import_appc._scrape_company_html')
+def appc_company():
+    with open(fixture_path('appc_company.html')) as f:
+        html = f.read()
+    company = {'id': '1001', 'name': 'Westminster Strategy Partners'}
+    date_range = ['2015-03-01', '2015-05-31']
+
+    command = import_appc.Command()
+    command.refresh = False
+    # staff, clients and countries are all listed as <li>s
+    return Workload(lambda: command._scrape_company_html(company, html, date_range), html.count('<li>'))
+
+
+@register('importers', 'helpers.parse_name')
+def parse_name():
+    with open(fixture_path('names.txt')) as f:
+        names = [x for x in f.read().split('\n') if x]
+    return Workload(lambda: [helpers.parse_name(name) for name in names], len(names))
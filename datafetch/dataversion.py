@@ -0,0 +1,92 @@
+"""
+A global data version, kept in a stamp file (DATA_VERSION_PATH). The
+data only changes when an import runs, so the version is bumped when
+an import finishes, and anything derived from the data can be
+considered fresh for as long as the version stays the same.
+
+Reading the version is a stat() (and, when it changes, a read) of
+the stamp file, so it never touches the database.
+"""
+from datetime import datetime
+import hashlib
+import os
+from os.path import dirname, exists
+
+from django.conf import settings
+from django.utils.decorators import method_decorator
+from django.utils.timezone import utc
+from django.views.decorators.http import condition
+
+
+# (mtime, version) of the last read of the stamp file
+_current = (None, '0')
+
+
+def get_data_version():
+    """
+    Return (version, last modified datetime). Before the first
+    import, that's ('0', None).
+    """
+    global _current
+    try:
+        mtime = os.stat(settings.DATA_VERSION_PATH).st_mtime
+    except FileNotFoundError:
+        return '0', None
+    if _current[0] != mtime:
+        with open(settings.DATA_VERSION_PATH) as f:
+            _current = (mtime, f.read().strip() or '0')
+    return _current[1], datetime.fromtimestamp(mtime, utc)
+
+
+def bump_data_version():
+    version, _ = get_data_version()
+    try:
+        version = str(int(version) + 1)
+    except ValueError:
+        version = '1'
+    path = settings.DATA_VERSION_PATH
+    if not exists(dirname(path)):
+        os.makedirs(dirname(path))
+    # write then rename, so readers never see a partial file
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+    return version
+
+
+def data_etag(request, *args, **kwargs):
+    """
+    A strong ETag for a response that's determined by the data version,
+    the URL (including query string) and the requested content type.
+    """
+    version, _ = get_data_version()
+    key = '\n'.join([version, request.get_full_path(), request.META.get('HTTP_ACCEPT', '')])
+    return hashlib.md5(key.encode('utf8')).hexdigest()
+
+
+def data_last_modified(request, *args, **kwargs):
+    return get_data_version()[1]
+
+
+# Answers If-None-Match / If-Modified-Since with a 304 (before
+# the view runs) if the data hasn't changed since
+data_version_condition = condition(etag_func=data_etag, last_modified_func=data_last_modified)
+
+
+class DataVersionConditionMixin(object):
+    """
+    Class-based view mixin that adds ETag and Last-Modified headers
+    and answers conditional GETs using the data version. Pages can
+    differ by user (e.g. editing links for editors), so only anonymous
+    requests get them.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated():
+            return super(DataVersionConditionMixin, self).dispatch(request, *args, **kwargs)
+        return self._conditional_dispatch(request, *args, **kwargs)
+
+    @method_decorator(data_version_condition)
+    def _conditional_dispatch(self, *args, **kwargs):
+        return super(DataVersionConditionMixin, self).dispatch(*args, **kwargs)
@@ -0,0 +1,194 @@
+"""
+Finding actors that are probably duplicates of each other (e.g. a
+donor created again because their name was spelt differently).
+
+Comparing every actor with every other doesn't scale, so actors are
+first partitioned into blocks by cheap keys: a person's surname and
+first initial, an organization's first words (ignoring "Ltd" and the
+like), a postcode and a company number. Only actors sharing a block are
+compared, by the similarity of their (normalised) names and other
+names, with a bonus for a shared postcode. Actors with the same company
+number are always candidates. Blocks are compared in a process pool.
+"""
+from collections import defaultdict, namedtuple
+from difflib import SequenceMatcher
+from multiprocessing import Pool
+import re
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+
+from datafetch import helpers, models
+from datafetch.names import name_tokens
+from datafetch.search import get_other_names
+
+
+# the least score for a pair to be a candidate
+MIN_SCORE = 0.85
+
+# added to the name similarity of actors sharing a postcode
+POSTCODE_BONUS = 0.1
+
+# blocks larger than this (e.g. a common surname) aren't compared, as
+# they'd cost more than they'd find
+MAX_BLOCK_SIZE = 1000
+
+COMPANY_NUMBER_SCHEMES = ('companieshouse', 'uk.gov.companieshouse')
+
+# words ignored in organizations' blocking keys
+_LEGAL_FORMS = {'ltd', 'plc', 'llp', 'co', 'corp', 'inc', 'and'}
+
+_postcode_re = re.compile(r'\b([A-Z]{1,2}[0-9][A-Z0-9]?) ?([0-9][A-Z]{2})\b')
+
+# the compared parts of an actor; `names` are normalised
+Record = namedtuple('Record', ('id', 'kind', 'names', 'postcodes', 'company_numbers'))
+
+Candidate = namedtuple('Candidate', ('score', 'actor_id', 'duplicate_id', 'reasons'))
+
+
+def postcodes(address):
+    """
+    The (normalised) UK postcodes in `address`.
+    """
+    return set(''.join(match) for match in _postcode_re.findall(address.upper()))
+
+
+def company_number(identifier):
+    # as import_ec stores them: upper case, zero-padded to 8 characters
+    return identifier.strip().upper().rjust(8, '0')
+
+
+def blocking_keys(record, person_names):
+    """
+    The blocks `record` goes in. `person_names` is the (family name,
+    given name) of a person, if known.
+    """
+    keys = set('postcode:{}'.format(x) for x in record.postcodes)
+    keys.update('company:{}'.format(x) for x in record.company_numbers)
+    for name in record.names:
+        words = name.split()
+        if not words:
+            continue
+        if record.kind == 'person':
+            keys.add('surname:{}:{}'.format(words[-1], words[0][0] if len(words) > 1 else ''))
+        else:
+            significant = [x for x in words if x not in _LEGAL_FORMS] or words
+            keys.add('name:{}'.format(' '.join(significant[:2])))
+    if person_names and person_names[0]:
+        family_name = ' '.join(name_tokens(person_names[0]))
+        given_name = name_tokens(person_names[1])
+        keys.add('surname:{}:{}'.format(family_name, given_name[0][0] if given_name else ''))
+    return keys
+
+
+def score(record, other):
+    """
+    Return (score, reasons) for how likely `record` and `other` are to
+    be the same actor.
+    """
+    if record.kind != other.kind:
+        return 0, []
+    if record.company_numbers & other.company_numbers:
+        return 1.0, ['company_number']
+    best = 0
+    for name in record.names:
+        for other_name in other.names:
+            matcher = SequenceMatcher(None, name, other_name)
+            # (the quick ratios are upper bounds on ratio())
+            if matcher.real_quick_ratio() > best and matcher.quick_ratio() > best:
+                best = max(best, matcher.ratio())
+    reasons = ['name']
+    if record.postcodes & other.postcodes:
+        best = min(1.0, best + POSTCODE_BONUS)
+        reasons.append('postcode')
+    return best, reasons
+
+
+def compare_block(block, min_score=MIN_SCORE):
+    """
+    Return a Candidate for each pair of Records in `block` scoring at
+    least `min_score`.
+    """
+    candidates = []
+    for idx, record in enumerate(block):
+        for other in block[idx + 1:]:
+            pair_score, reasons = score(record, other)
+            if pair_score >= min_score:
+                actor_id, duplicate_id = sorted((record.id, other.id))
+                candidates.append(Candidate(pair_score, actor_id, duplicate_id, reasons))
+    return candidates
+
+
+def _compare_block(args):
+    return compare_block(*args)
+
+
+def load_records():
+    """
+    Return ({actor id: Record}, {person id: (family name, given name)})
+    for every actor, in a handful of queries.
+    """
+    content_types = ContentType.objects.get_for_models(models.Actor, models.Person, models.Organization).values()
+    addresses = defaultdict(set)
+    for actor_id, value in (models.ContactDetail.objects
+                            .filter(content_type__in=content_types, contact_type='address')
+                            .values_list('object_id', 'value').iterator()):
+        addresses[actor_id].update(postcodes(value))
+    numbers = defaultdict(set)
+    for actor_id, identifier in (models.Identifier.objects
+                                 .filter(content_type__in=content_types, scheme__in=COMPANY_NUMBER_SCHEMES)
+                                 .values_list('object_id', 'identifier').iterator()):
+        numbers[actor_id].add(company_number(identifier))
+    other_names = get_other_names()
+
+    records = {}
+    for actor_id, kind, name in models.Actor.objects.non_polymorphic().values_list('id', 'kind', 'name').iterator():
+        names = [name] + [x for _, x in other_names.get(actor_id, [])]
+        if kind == 'person':
+            # "Sir John Smith" is "John Smith"
+            names = [helpers.parse_name(x)[0] for x in names]
+        names = set(' '.join(name_tokens(x)) for x in names)
+        records[actor_id] = Record(actor_id, kind, tuple(sorted(names)),
+                                   frozenset(addresses.get(actor_id, ())), frozenset(numbers.get(actor_id, ())))
+    person_names = {x[0]: x[1:] for x in models.Person.objects.exclude(family_name='')
+                    .values_list('id', 'family_name', 'given_name').iterator()}
+    return records, person_names
+
+
+def find_duplicates(min_score=MIN_SCORE, processes=None, max_block_size=MAX_BLOCK_SIZE):
+    """
+    Return a list of Candidates, best first. Each pair of actors appears
+    once, with the lower id as `actor_id`. `processes` is the size of
+    the process pool (by default, the number of CPUs); with 1, blocks
+    are compared in this process.
+    """
+    records, person_names = load_records()
+    blocks = defaultdict(list)
+    for record in records.values():
+        for key in blocking_keys(record, person_names.get(record.id)):
+            blocks[key].append(record.id)
+    work = [([records[x] for x in sorted(ids)], min_score) for key, ids in blocks.items()
+            if 1 < len(ids) and (len(ids) <= max_block_size or key.startswith('company:'))]
+    # biggest first, so that a large block isn't left until last
+    work.sort(key=lambda x: len(x[0]), reverse=True)
+
+    if processes == 1:
+        results = map(_compare_block, work)
+    else:
+        # the workers don't use the database, and shouldn't share
+        # this process's connections
+        connections.close_all()
+        pool = Pool(processes)
+        results = pool.imap_unordered(_compare_block, work, chunksize=16)
+
+    candidates = {}
+    try:
+        for block_candidates in results:
+            # (a pair in several blocks gets the same score in each)
+            for candidate in block_candidates:
+                candidates[candidate.actor_id, candidate.duplicate_id] = candidate
+    finally:
+        if processes != 1:
+            pool.close()
+            pool.join()
+    return sorted(candidates.values(), key=lambda x: (-x.score, x.actor_id, x.duplicate_id))
@@ -0,0 +1,226 @@
+"""
+An in-process graph of actors, linked by donations, consultancies and
+memberships, for multi-hop questions ("how is A connected to B", "who
+is within two hops of A") that would take a join per hop in the
+database.
+
+The graph is kept in compressed sparse row form: every actor that has
+a relationship gets an index, and the edges of actor `i` are the
+entries `offsets[i]:offsets[i + 1]` of the `neighbours`, `edge_types`
+and `weights` arrays. Each relationship appears once in each direction,
+and parallel relationships (e.g. many donations from A to B) are
+merged into one edge, whose weight is their total value (for
+donations) or their number.
+
+The graph is built on first use, and rebuilt when the data version
+changes (i.e. after an import), or when a donation, consultancy or
+membership is saved or deleted in this process.
+"""
+from array import array
+from collections import OrderedDict, namedtuple
+import threading
+
+from django.db.models import Count, Sum
+
+from datafetch.dataversion import get_data_version
+
+
+# relationship -> (model, source foreign key, target foreign key,
+# field whose total is the weight (or None, for the number of rows))
+RELATIONSHIPS = OrderedDict([
+    ('donation', ('Donation', 'donor', 'recipient', 'value')),
+    ('consultancy', ('Consultancy', 'agency', 'client', None)),
+    ('membership', ('Membership', 'person', 'organization', None)),
+])
+
+# the longest path looked for by default
+MAX_HOPS = 6
+
+# the most actors returned by a neighbourhood query
+MAX_NEIGHBOURS = 1000
+
+# one edge of a path; `source` is the donor, agency or member
+Step = namedtuple('Step', ('source', 'target', 'relationship', 'weight'))
+
+
+class InfluenceGraph(object):
+    def __init__(self, edges):
+        """
+        `edges` is an iterable of (source actor id, target actor id,
+        relationship, weight), with one edge per source, target and
+        relationship.
+        """
+        edges = [x for x in edges if x[0] != x[1]]
+        ids = sorted(set(x[0] for x in edges) | set(x[1] for x in edges))
+        self.actor_ids = array('l', ids)
+        self.index = {actor_id: idx for idx, actor_id in enumerate(ids)}
+        self.relationships = list(RELATIONSHIPS)
+        codes = {relationship: code for code, relationship in enumerate(self.relationships)}
+
+        degrees = [0] * (len(ids) + 1)
+        for source, target, _, _ in edges:
+            degrees[self.index[source]] += 1
+            degrees[self.index[target]] += 1
+        self.offsets = array('l', [0])
+        for degree in degrees[:-1]:
+            self.offsets.append(self.offsets[-1] + degree)
+
+        size = self.offsets[-1]
+        self.neighbours = array('l', [0]) * size
+        # the relationship's code, times two, plus one if the edge
+        # goes from the actor to the neighbour (e.g. donor to recipient)
+        self.edge_types = array('b', [0]) * size
+        self.weights = array('d', [0]) * size
+        position = array('l', self.offsets[:-1])
+        for source, target, relationship, weight in edges:
+            code = codes[relationship] * 2
+            for node, neighbour, forward in ((self.index[source], self.index[target], 1),
+                                             (self.index[target], self.index[source], 0)):
+                idx = position[node]
+                self.neighbours[idx] = neighbour
+                self.edge_types[idx] = code + forward
+                self.weights[idx] = weight
+                position[node] += 1
+
+    @classmethod
+    def build(cls):
+        from datafetch import models
+
+        def edges():
+            for relationship, (model, source, target, weight) in RELATIONSHIPS.items():
+                source, target = '{}_id'.format(source), '{}_id'.format(target)
+                rows = (getattr(models, model).objects.exclude(**{source: None}).exclude(**{target: None})
+                        .values_list(source, target).order_by())
+                if weight is None:
+                    rows = rows.annotate(weight=Count('id'))
+                else:
+                    rows = rows.annotate(weight=Sum(weight))
+                for source_id, target_id, total in rows.iterator():
+                    yield source_id, target_id, relationship, float(total or 0)
+        return cls(edges())
+
+    def __len__(self):
+        return len(self.actor_ids)
+
+    def _allowed_codes(self, relationships):
+        if relationships is None:
+            return None
+        return set(code * 2 + forward for code, relationship in enumerate(self.relationships)
+                   if relationship in relationships for forward in (0, 1))
+
+    def _edges(self, node, allowed):
+        for idx in range(self.offsets[node], self.offsets[node + 1]):
+            if allowed is None or self.edge_types[idx] in allowed:
+                yield idx
+
+    def _step(self, node, idx):
+        source, target = self.actor_ids[node], self.actor_ids[self.neighbours[idx]]
+        code, forward = divmod(self.edge_types[idx], 2)
+        if not forward:
+            source, target = target, source
+        return Step(source, target, self.relationships[code], self.weights[idx])
+
+    def path(self, source_id, target_id, max_hops=MAX_HOPS, relationships=None):
+        """
+        Return the Steps of a shortest path (ignoring the direction of
+        relationships) between two actors, of at most `max_hops`, and
+        only through `relationships` if given; or None if there isn't
+        one. (An actor is connected to themselves by an empty path.)
+        """
+        if source_id not in self.index or target_id not in self.index:
+            return None
+        if source_id == target_id:
+            return []
+        allowed = self._allowed_codes(relationships)
+        source, target = self.index[source_id], self.index[target_id]
+        # a breadth-first search from each end, expanding whichever
+        # side has fewer edges to follow, until they meet.
+        # node -> (previous node, edge index, hops from that end)
+        parents = ({source: (None, None, 0)}, {target: (None, None, 0)})
+        frontiers = ([source], [target])
+        for _ in range(max_hops):
+            side = min((0, 1), key=lambda s: sum(self.offsets[x + 1] - self.offsets[x] for x in frontiers[s]))
+            seen, other = parents[side], parents[1 - side]
+            frontier = []
+            meeting = None
+            for node in frontiers[side]:
+                hops = seen[node][2] + 1
+                for idx in self._edges(node, allowed):
+                    neighbour = self.neighbours[idx]
+                    if neighbour in seen:
+                        continue
+                    seen[neighbour] = (node, idx, hops)
+                    frontier.append(neighbour)
+                    # (the other side's nodes aren't all the same
+                    # distance from its end, so pick the nearest)
+                    if neighbour in other and (meeting is None or other[neighbour][2] < other[meeting][2]):
+                        meeting = neighbour
+            if meeting is not None:
+                return self._join(parents, meeting)
+            if not frontier:
+                return None
+            frontiers = (frontier, frontiers[1]) if side == 0 else (frontiers[0], frontier)
+        return None
+
+    def _join(self, parents, meeting):
+        steps = []
+        node = meeting
+        while parents[0][node][0] is not None:
+            previous, idx, _ = parents[0][node]
+            steps.append(self._step(previous, idx))
+            node = previous
+        steps.reverse()
+        node = meeting
+        while parents[1][node][0] is not None:
+            following, idx, _ = parents[1][node]
+            steps.append(self._step(following, idx))
+            node = following
+        return steps
+
+    def neighbourhood(self, actor_id, hops=2, relationships=None, limit=MAX_NEIGHBOURS):
+        """
+        Return {actor id: number of hops} for the actors within `hops` of
+        `actor_id` (not including them), nearest first, stopping after
+        `limit`; and whether there were more.
+        """
+        result = OrderedDict()
+        if actor_id not in self.index:
+            return result, False
+        allowed = self._allowed_codes(relationships)
+        start = self.index[actor_id]
+        seen = {start}
+        frontier = [start]
+        for hop in range(1, hops + 1):
+            next_frontier = []
+            for node in frontier:
+                for idx in self._edges(node, allowed):
+                    neighbour = self.neighbours[idx]
+                    if neighbour in seen:
+                        continue
+                    if len(result) == limit:
+                        return result, True
+                    seen.add(neighbour)
+                    result[self.actor_ids[neighbour]] = hop
+                    next_frontier.append(neighbour)
+            frontier = next_frontier
+        return result, False
+
+
+# (data version, graph)
+_graph = (None, None)
+_lock = threading.Lock()
+
+
+def get_influence_graph():
+    global _graph
+    version, _ = get_data_version()
+    with _lock:
+        if _graph[1] is None or _graph[0] != version:
+            _graph = (version, InfluenceGraph.build())
+        return _graph[1]
+
+
+def clear_influence_graph(sender=None, **kwargs):
+    global _graph
+    with _lock:
+        _graph = (None, None)
@@ -10,6 +10,9 @@ from django.conf import settings
 
 import requests
 
+from datafetch.dataversion import bump_data_version
+from datafetch.signals import import_finished
+
 
 """
 very basic caching sort of thing
@@ -107,6 +110,15 @@ def parse_company_name(name):
 def snake_case(camel_case_text):
     return re.sub(r'([a-z])([A-Z])', r'\1_\2', camel_case_text).lower()
 
+"""
+read an Electoral Commission CSV from a file-like object,
+converting the column headings to snake_case
+"""
+def parse_ec_csv(f):
+    reader = csv.DictReader(f)
+    reader.fieldnames = [snake_case(fieldname) for fieldname in reader.fieldnames]
+    return list(reader)
+
 def fetch_ec_csv(url, filename, path=None, refresh=False):
     datadir = join(settings.BASE_DIR, 'data')
     if path:
@@ -114,15 +126,22 @@ def fetch_ec_csv(url, filename, path=None, refresh=False):
     filepath = join(datadir, filename)
     if exists(filepath) and not refresh:
         with open(filepath) as f:
-            reader = csv.DictReader(f)
-            reader.fieldnames = [snake_case(fieldname) for fieldname in reader.fieldnames]
-            return list(reader)
+            return parse_ec_csv(f)
     else:
         r = requests.get(url)
         r.encoding = "utf8"
         raw_text = r.text[1:]
         with open(filepath, "w") as f:
             f.write(raw_text)
-        reader = csv.DictReader(StringIO(raw_text))
-        reader.fieldnames = [snake_case(fieldname) for fieldname in reader.fieldnames]
-        return list(reader)
+        return parse_ec_csv(StringIO(raw_text))
+
+"""
+call at the end of an import command, once its changes are
+committed. This lets the tables derived from the data (rollups,
+rankings, the search index, ...) catch up, then bumps the data
+version, so that caches keyed on it are only refilled once those are
+up to date.
+"""
+def finish_import(command):
+    import_finished.send(sender=command.__class__, command=command)
+    return bump_data_version()
@@ -0,0 +1,160 @@
+"""
+An in-process index of who held which role when, for answering "who
+held role R on date D" without joining through Membership, and of the
+distinct roles themselves (for the role picker).
+
+The index is built from Membership on first use, and rebuilt when the
+data version changes (i.e. after an import), or when a membership is
+saved or deleted in this process.
+"""
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from datetime import date
+import threading
+
+from datafetch.dataversion import get_data_version
+
+
+class IntervalTree(object):
+    """
+    A static (centred) interval tree over closed intervals. `intervals`
+    is an iterable of (start, end, value); `at(point)` yields the value
+    of every interval containing `point`, in O(log n + k).
+    """
+    def __init__(self, intervals):
+        self.root = self._build(sorted(intervals, key=lambda x: (x[0], x[1])))
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        center = intervals[len(intervals) // 2][0]
+        left, here, right = [], [], []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        # (`intervals` is sorted by start, so `here` is too)
+        by_end = sorted(here, key=lambda x: x[1], reverse=True)
+        return (center, here, by_end, self._build(left), self._build(right))
+
+    def at(self, point):
+        node = self.root
+        while node is not None:
+            center, by_start, by_end, left, right = node
+            if point < center:
+                for start, end, value in by_start:
+                    if start > point:
+                        break
+                    yield value
+                node = left
+            elif point > center:
+                for start, end, value in by_end:
+                    if end < point:
+                        break
+                    yield value
+                node = right
+            else:
+                for start, end, value in by_start:
+                    yield value
+                break
+
+
+# A distinct role, with the number of memberships and people holding
+# it, the earliest start and the latest end (None if any are ongoing)
+Role = namedtuple('Role', ('role', 'memberships', 'people', 'valid_from', 'valid_until'))
+
+
+class MembershipIndex(object):
+    """
+    Person ids by role, an interval tree per role over the memberships'
+    validity ranges, and a catalogue of the distinct roles. Memberships
+    without a start date count for the role, but not for any particular
+    date (as in `MembershipQuerySet.current`); those without an end
+    date are open-ended.
+    """
+    def __init__(self, memberships):
+        """
+        `memberships` is an iterable of
+        (role, person id, valid_from, valid_until).
+        """
+        self.people = set()
+        self.people_by_role = defaultdict(set)
+        intervals = defaultdict(list)
+        counts = defaultdict(int)
+        spans = {}
+        for role, person_id, valid_from, valid_until in memberships:
+            self.people.add(person_id)
+            self.people_by_role[role].add(person_id)
+            counts[role] += 1
+            valid_until = valid_until or date.max
+            if valid_from is not None:
+                intervals[role].append((valid_from, valid_until, person_id))
+            first, last = spans.get(role, (None, date.min))
+            if valid_from is not None and (first is None or valid_from < first):
+                first = valid_from
+            spans[role] = (first, max(last, valid_until))
+        self.trees = {role: IntervalTree(x) for role, x in intervals.items()}
+
+        # sorted case-insensitively, for prefix searches
+        self.roles = sorted((Role(
+            role, counts[role], len(self.people_by_role[role]), spans[role][0],
+            None if spans[role][1] == date.max else spans[role][1],
+        ) for role in counts), key=lambda x: (x.role.lower(), x.role))
+        self._role_keys = [x.role.lower() for x in self.roles]
+
+    @classmethod
+    def build(cls):
+        from datafetch import models
+        rows = models.Membership.objects.values_list('role', 'person_id', 'valid_from', 'valid_until')
+        return cls(rows.order_by().iterator())
+
+    def holders(self, role=None, moment=None):
+        """
+        The ids of the people who've held `role` (or any role),
+        on `moment` if given.
+        """
+        if role is None:
+            return set(self.people)
+        if moment is None:
+            return set(self.people_by_role.get(role, ()))
+        tree = self.trees.get(role)
+        return set(tree.at(moment)) if tree is not None else set()
+
+    def find_roles(self, search=None):
+        """
+        The roles containing `search` (case-insensitively), those
+        starting with it first, or every role.
+        """
+        if not search:
+            return list(self.roles)
+        search = search.lower()
+        start = bisect_left(self._role_keys, search)
+        end = start
+        while end < len(self._role_keys) and self._role_keys[end].startswith(search):
+            end += 1
+        others = [x for idx, x in enumerate(self.roles)
+                  if (idx < start or idx >= end) and search in self._role_keys[idx]]
+        return self.roles[start:end] + others
+
+
+# (data version, index)
+_index = (None, None)
+_lock = threading.Lock()
+
+
+def get_membership_index():
+    global _index
+    version, _ = get_data_version()
+    with _lock:
+        if _index[1] is None or _index[0] != version:
+            _index = (version, MembershipIndex.build())
+        return _index[1]
+
+
+def clear_membership_index(sender=None, **kwargs):
+    global _index
+    with _lock:
+        _index = (None, None)
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from datafetch import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Run benchmarks against a fresh test database and check for regressions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Only run these benchmarks')
+        parser.add_argument('--suite', help='Only run benchmarks in this suite, e.g. "importers"')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--baseline', default=benchmarks.BASELINE_PATH)
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Store these results as the new baseline instead of comparing')
+
+    def _format(self, metric, value):
+        if value is None:
+            return '-'
+        if metric == 'peak_memory':
+            return '{:,.0f}kB'.format(value / 1024)
+        if metric == 'wall_time':
+            return '{:.3f}s'.format(value)
+        return '{:,}'.format(value)
+
+    def handle(self, *args, **options):
+        # benchmarks always run against an empty, freshly
+        # migrated database, so the numbers are repeatable
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = benchmarks.run_benchmarks(
+                names=options.get('names'),
+                suite=options.get('suite'),
+                repeat=options.get('repeat'),
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if not results:
+            raise CommandError('No benchmarks matched.')
+
+        for name, result in results.items():
+            print('{} ({} rows)'.format(name, result['rows']))
+            for metric in benchmarks.METRICS:
+                print('  {:<14}{}'.format(metric, self._format(metric, result[metric])))
+
+        if options.get('update_baseline'):
+            benchmarks.save_baseline(results, options.get('baseline'))
+            print('Baseline updated.')
+            return
+
+        baseline = benchmarks.load_baseline(options.get('baseline'))
+        regressions = benchmarks.compare(results, baseline, settings.BENCHMARK_THRESHOLDS)
+        if regressions:
+            for name, metric, old, new in regressions:
+                self.stderr.write('{}: {} regressed from {} to {}'.format(
+                    name, metric, self._format(metric, old), self._format(metric, new)))
+            raise CommandError('{} benchmark metric(s) regressed.'.format(len(regressions)))
+        print('No regressions.')
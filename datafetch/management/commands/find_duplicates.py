@@ -0,0 +1,44 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand
+
+from datafetch import dedup, models
+
+
+class Command(BaseCommand):
+    help = 'List pairs of actors that are probably duplicates, as CSV, best first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-score', type=float, default=dedup.MIN_SCORE)
+        parser.add_argument('--processes', type=int, help='Size of the process pool (default: number of CPUs)')
+        parser.add_argument('--max-block-size', type=int, default=dedup.MAX_BLOCK_SIZE)
+        parser.add_argument('--output', help='Write to this file, rather than stdout')
+
+    def handle(self, *args, **options):
+        candidates = dedup.find_duplicates(
+            min_score=options['min_score'],
+            processes=options.get('processes'),
+            max_block_size=options['max_block_size'],
+        )
+        ids = sorted(set(x.actor_id for x in candidates) | set(x.duplicate_id for x in candidates))
+        names = {}
+        for idx in range(0, len(ids), 500):
+            names.update(models.Actor.objects.non_polymorphic().filter(
+                id__in=ids[idx:idx + 500]).values_list('id', 'name'))
+
+        f = open(options['output'], 'w', newline='') if options.get('output') else sys.stdout
+        try:
+            writer = csv.writer(f)
+            writer.writerow(['score', 'actor_id', 'actor_name', 'duplicate_id', 'duplicate_name', 'reasons'])
+            for candidate in candidates:
+                writer.writerow([
+                    '{:.3f}'.format(candidate.score),
+                    candidate.actor_id, names.get(candidate.actor_id),
+                    candidate.duplicate_id, names.get(candidate.duplicate_id),
+                    ' '.join(candidate.reasons),
+                ])
+        finally:
+            if f is not sys.stdout:
+                f.close()
+        print('Found {} candidate pair(s).'.format(len(candidates)), file=sys.stderr)
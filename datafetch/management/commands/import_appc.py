@@ -142,3 +142,5 @@ class Command(BaseCommand):
         for company in companies:
             html = self._fetch_company(company, path)
             self._scrape_company_html(company, html, date_range)
+
+        helpers.finish_import(self)
@@ -54,3 +54,5 @@ class Command(BaseCommand):
         print("Fetching extra organizational data from Companies House ...")
         identifiers = models.Identifier.objects.filter(scheme="uk.gov.companieshouse")
         self._fetch_companies_house(identifiers)
+
+        helpers.finish_import(self)
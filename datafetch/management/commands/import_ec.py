@@ -256,3 +256,5 @@ class Command(BaseCommand):
 
         print("Processing donations ...")
         self._process_donations(donations)
+
+        helpers.finish_import(self)
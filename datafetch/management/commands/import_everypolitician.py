@@ -58,3 +58,5 @@ class Command(BaseCommand):
 
         print("Processing people ...")
         self._process_people(j['persons'])
+
+        helpers.finish_import(self)
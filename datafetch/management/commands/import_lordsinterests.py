@@ -35,3 +35,5 @@ class Command(BaseCommand):
 
         print("Downloading Lords’ Interests ...")
         data = self._bulk_download_lords_interests()
+
+        helpers.finish_import(self)
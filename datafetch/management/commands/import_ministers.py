@@ -55,3 +55,5 @@ class Command(BaseCommand):
             print("Processing ministerial posts ...")
             for membership in j['memberships']:
                 self._process_minister(membership, j)
+
+        helpers.finish_import(self)
@@ -43,3 +43,5 @@ class Command(BaseCommand):
 
         print("Downloading MPs’ Interests ...")
         data = self._download_mps_interests()
+
+        helpers.finish_import(self)
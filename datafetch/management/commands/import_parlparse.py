@@ -259,3 +259,5 @@ class Command(BaseCommand):
 
         print("Processing memberships ...")
         self._process_memberships(j['memberships'], j)
+
+        helpers.finish_import(self)
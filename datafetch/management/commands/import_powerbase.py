@@ -3,7 +3,7 @@ import time
 from django.core.management.base import BaseCommand, CommandError
 import requests
 
-from datafetch import models
+from datafetch import models, helpers
 
 class Command(BaseCommand):
     help = 'Import Powerbase links'
@@ -25,3 +25,5 @@ class Command(BaseCommand):
         print("Discovering Powerbase URLs ...")
         politicians = models.Person.objects.filter(identifiers__scheme='uk.org.publicwhip')
         self._fetch_powerbase(politicians)
+
+        helpers.finish_import(self)
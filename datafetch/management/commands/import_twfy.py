@@ -80,3 +80,5 @@ class Command(BaseCommand):
             #         print(position)
 
         # print("Done.")
+
+        helpers.finish_import(self)
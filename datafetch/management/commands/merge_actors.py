@@ -0,0 +1,27 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from datafetch.merge import BATCH_SIZE, merge_actors
+
+
+class Command(BaseCommand):
+    help = 'Merge duplicate actors, each given as ACTOR_ID:DUPLICATE_ID or read from a find_duplicates CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pairs', nargs='*', help='ACTOR_ID:DUPLICATE_ID, merging the duplicate into the actor')
+        parser.add_argument('--csv', help='Merge the actor_id, duplicate_id pairs in this file')
+        parser.add_argument('--min-score', type=float, help='Only merge the pairs in --csv scoring at least this')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            pairs = [pair.split(':') for pair in options['pairs']]
+            if options.get('csv'):
+                with open(options['csv'], newline='') as f:
+                    pairs += [(row['actor_id'], row['duplicate_id']) for row in csv.DictReader(f)
+                              if options.get('min_score') is None or float(row['score']) >= options['min_score']]
+            num_merged = merge_actors(pairs, batch_size=options['batch_size'])
+        except (ValueError, KeyError) as e:
+            raise CommandError(e)
+        print('Merged {} actor(s).'.format(num_merged))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from datafetch import models
+
+
+class Command(BaseCommand):
+    help = 'Bring the donation rollups, actor summaries, rankings, similarities and hierarchies up to date (or rebuild them with --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true')
+
+    def handle(self, *args, **options):
+        num_new = models.refresh_donation_rollups(full=options.get('full'))
+        print('Rolled up {} donation(s).'.format(num_new))
+        num_actors = models.refresh_actor_summaries(full=options.get('full'))
+        print('Refreshed {} actor summaries.'.format(num_actors))
+        num_ranked = models.refresh_actor_rankings()
+        print('Ranked {} actor(s).'.format(num_ranked))
+        num_similar = models.refresh_actor_similarities(full=options.get('full'))
+        print('Refreshed the similarities of {} actor(s).'.format(num_similar))
+        num_links = models.refresh_closures()
+        print('Changed {} organization and area hierarchy link(s).'.format(num_links))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from datafetch.search import update_search_index
+
+
+class Command(BaseCommand):
+    help = 'Bring the actor search index up to date (or rebuild it with --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true')
+
+    def handle(self, *args, **options):
+        num_actors = update_search_index(full=options.get('full'))
+        print('Indexed {} actor(s).'.format(num_actors))
@@ -0,0 +1,208 @@
+"""
+Merging duplicate actors (see `datafetch.dedup`): every relationship,
+membership and generic child (other names, identifiers, ...) of the
+duplicate is moved to the actor it's merged into, and the duplicate is
+deleted.
+
+Everything is moved with a handful of set-based UPDATEs per batch of
+pairs (one CASE over the batch per foreign key), rather than by saving
+objects one at a time.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.utils import timezone
+
+from datafetch import models
+from datafetch.dataversion import bump_data_version
+from datafetch.search import remove_from_search_index, update_search_index
+
+
+# (a batch's CASE has two parameters per pair, plus one per pair for
+# its IN, which keeps it under SQLite's limit of 999 parameters)
+BATCH_SIZE = 300
+
+# (model, foreign key) pointing at an actor, for each kind of actor.
+# Memberships, posts and child organizations point at the concrete
+# model, whose id is the actor's.
+ACTOR_FOREIGN_KEYS = {
+    'person': [
+        (models.Membership, 'person'),
+    ],
+    'organization': [
+        (models.Membership, 'organization'),
+        (models.Membership, 'on_behalf_of'),
+        (models.Post, 'organization'),
+        (models.Organization, 'parent'),
+    ],
+}
+RELATIONSHIP_FOREIGN_KEYS = [
+    (models.Donation, 'donor'),
+    (models.Donation, 'recipient'),
+    (models.Consultancy, 'client'),
+    (models.Consultancy, 'agency'),
+]
+
+GENERIC_CHILDREN = [models.OtherName, models.Identifier, models.Link, models.ContactDetail,
+                    models.Source, models.Note]
+
+# the fields that don't count when deciding whether two generic
+# children are the same
+_IGNORED_FIELDS = {'id', 'object_id', 'created_at', 'updated_at'}
+
+
+def resolve_pairs(pairs):
+    """
+    Return {duplicate id: id of the actor it ends up merged into} for
+    `pairs` of (actor id, duplicate id). Pairs that overlap are merged
+    into one actor: if B is merged into A and C into B, or B and C are
+    both merged into A and C is also merged into B, B and C are merged
+    into A.
+    """
+    # actor id -> the actor it's merged into, for a union-find over the
+    # pairs, whose roots are the actors everything is merged into
+    parents = {}
+
+    def root(actor_id):
+        path = []
+        while parents.get(actor_id, actor_id) != actor_id:
+            path.append(actor_id)
+            actor_id = parents[actor_id]
+        for pk in path:
+            parents[pk] = actor_id
+        return actor_id
+
+    for actor_id, duplicate_id in pairs:
+        actor_id, duplicate_id = int(actor_id), int(duplicate_id)
+        if actor_id == duplicate_id:
+            raise ValueError("Can't merge actor {} into itself".format(actor_id))
+        actor_root, duplicate_root = root(actor_id), root(duplicate_id)
+        if actor_root != duplicate_root:
+            parents[duplicate_root] = actor_root
+
+    return {pk: root(pk) for pk in list(parents) if root(pk) != pk}
+
+
+def _repoint(queryset, column, merged_into, **extra):
+    """
+    Point `column` of the rows of `queryset` referring to a duplicate
+    at the actor it's merged into, with one UPDATE.
+    """
+    whens = [When(**{column: duplicate_id, 'then': Value(actor_id)})
+             for duplicate_id, actor_id in merged_into.items()]
+    return queryset.filter(**{'{}__in'.format(column): list(merged_into)}).update(
+        **dict(extra, **{column: Case(*whens, output_field=IntegerField())}))
+
+
+def _dedupe_generic_children(children, batch_size=BATCH_SIZE):
+    """
+    Delete all but the first of each set of identical `children`
+    (generic children of some actors), `batch_size` at a time.
+    """
+    fields = [f.attname for f in children.model._meta.concrete_fields if f.attname not in _IGNORED_FIELDS]
+    seen, duplicate_ids = set(), []
+    for row in children.order_by('id').values_list('id', 'object_id', *fields).iterator():
+        if row[1:] in seen:
+            duplicate_ids.append(row[0])
+        else:
+            seen.add(row[1:])
+    for idx in range(0, len(duplicate_ids), batch_size):
+        children.model.objects.filter(id__in=duplicate_ids[idx:idx + batch_size]).delete()
+
+
+def _merge_batch(merged_into, names):
+    now = timezone.now()
+    actor_ids = set(merged_into.values())
+    kinds = dict(models.Actor.objects.non_polymorphic().filter(
+        id__in=list(actor_ids)).values_list('id', 'kind'))
+    content_types = ContentType.objects.get_for_models(models.Actor, models.Person, models.Organization)
+    content_type_by_kind = {'person': content_types[models.Person],
+                            'organization': content_types[models.Organization]}
+
+    for model, field in RELATIONSHIP_FOREIGN_KEYS:
+        _repoint(model.objects.all(), '{}_id'.format(field), merged_into, updated_at=now)
+    # an organization merged into one of its children would become the
+    # child's parent, so the child takes the organization's parent
+    # instead: {child id: new parent id}
+    new_parents = {}
+    merged_parents = {pk: parent_id for pk, parent_id in models.Organization.objects.filter(
+        id__in=list(actor_ids), parent_id__in=list(merged_into)).values_list('id', 'parent_id')
+        if merged_into[parent_id] == pk}
+    if merged_parents:
+        grandparents = dict(models.Organization.objects.filter(
+            id__in=list(merged_parents.values())).values_list('id', 'parent_id'))
+        for pk, parent_id in merged_parents.items():
+            grandparent_id = merged_into.get(grandparents[parent_id], grandparents[parent_id])
+            new_parents[pk] = None if grandparent_id == pk else grandparent_id
+    for kind, foreign_keys in ACTOR_FOREIGN_KEYS.items():
+        of_kind = {k: v for k, v in merged_into.items() if kinds[v] == kind}
+        if of_kind:
+            for model, field in foreign_keys:
+                _repoint(model.objects.all(), '{}_id'.format(field), of_kind, updated_at=now)
+    for pk, parent_id in new_parents.items():
+        models.Organization.objects.filter(id=pk).update(parent_id=parent_id, updated_at=now)
+    # (the duplicates' own summaries and tokens go with them)
+    _repoint(models.RelationshipToken.objects.all(), 'counterpart_id', merged_into)
+
+    # a duplicate's name is kept as an other name
+    models.OtherName.objects.bulk_create([
+        models.OtherName(content_type=content_type_by_kind[kinds[actor_id]], object_id=actor_id,
+                         name=names[duplicate_id], note='Name of a merged duplicate')
+        for duplicate_id, actor_id in merged_into.items()
+        if names[duplicate_id] != names[actor_id]
+    ])
+    for model in GENERIC_CHILDREN:
+        children = model.objects.filter(content_type__in=content_types.values())
+        _repoint(children, 'object_id', merged_into)
+        _dedupe_generic_children(children.filter(object_id__in=list(actor_ids)))
+
+    # (so that the search index picks up their new other names)
+    models.Actor.objects.filter(id__in=list(actor_ids)).update(updated_at=now)
+    models.Actor.objects.non_polymorphic().filter(id__in=list(merged_into)).delete()
+
+
+def merge_actors(pairs, batch_size=BATCH_SIZE):
+    """
+    Merge `pairs` of (actor id, duplicate id), each duplicate into its
+    actor, in one transaction per `batch_size` pairs, then bring the
+    merged actors' rollups, summaries, search index entries, the
+    organization hierarchy, and the actor rankings and similarities up
+    to date, and bump the data version (like an import, this changes
+    what the API and pages show).
+
+    Both actors of a pair must be of the same kind. Returns the number
+    of actors merged away.
+    """
+    merged_into = resolve_pairs(pairs)
+    ids = sorted(set(merged_into) | set(merged_into.values()))
+    actors = {}
+    for idx in range(0, len(ids), batch_size):
+        actors.update((pk, (kind, name)) for pk, kind, name in models.Actor.objects.non_polymorphic()
+                      .filter(id__in=ids[idx:idx + batch_size]).values_list('id', 'kind', 'name'))
+    for duplicate_id, actor_id in merged_into.items():
+        for pk in (duplicate_id, actor_id):
+            if pk not in actors:
+                raise ValueError("No actor with id {}".format(pk))
+        if actors[duplicate_id][0] != actors[actor_id][0]:
+            raise ValueError("Can't merge {} {} into {} {}".format(
+                actors[duplicate_id][0], duplicate_id, actors[actor_id][0], actor_id))
+    names = {pk: name for pk, (_, name) in actors.items()}
+
+    duplicate_ids = sorted(merged_into)
+    for idx in range(0, len(duplicate_ids), batch_size):
+        batch = duplicate_ids[idx:idx + batch_size]
+        with transaction.atomic():
+            _merge_batch({x: merged_into[x] for x in batch}, names)
+
+    actor_ids = sorted(set(merged_into.values()))
+    models.refresh_donation_rollups(actor_ids=actor_ids)
+    models.refresh_actor_summaries(actor_ids=actor_ids)
+    # (child organizations were re-pointed without being saved)
+    models.refresh_closure(models.Organization)
+    models.refresh_actor_rankings()
+    # (which actors are similar changes without any new donations)
+    models.refresh_actor_similarities(full=True)
+    remove_from_search_index(duplicate_ids)
+    update_search_index()
+    bump_data_version()
+    return len(duplicate_ids)
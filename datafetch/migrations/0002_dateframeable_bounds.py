@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import calendar
+from datetime import date
+
+from django.db import migrations, models
+
+
+DATEFRAMEABLE_MODELS = ('Actor', 'Area', 'Consultancy', 'ContactDetail', 'Donation', 'Membership', 'OtherName', 'Post')
+
+
+# (frozen copies of partial_date_bounds and update_date_bounds from
+# datafetch.models.popolo.behaviors, so that changes to those don't
+# change what this migration does)
+def partial_date_bounds(value):
+    if not value:
+        return None, None
+    parts = [int(x) for x in value.split('-')]
+    if len(parts) == 1:
+        return date(parts[0], 1, 1), date(parts[0], 12, 31)
+    if len(parts) == 2:
+        last_day = calendar.monthrange(parts[0], parts[1])[1]
+        return date(parts[0], parts[1], 1), date(parts[0], parts[1], last_day)
+    if len(parts) == 3:
+        d = date(*parts)
+        return d, d
+    raise ValueError("date seems not to be correct %s" % value)
+
+
+def update_date_bounds(queryset):
+    for field, bound, idx in (('start_date', 'valid_from', 0), ('end_date', 'valid_until', 1)):
+        values = queryset.order_by().values_list(field, flat=True).distinct()
+        for value in list(values):
+            try:
+                bound_value = partial_date_bounds(value)[idx]
+            except ValueError:
+                bound_value = None
+            queryset.filter(**{field: value}).update(**{bound: bound_value})
+    # (the range index below needs start <= end)
+    queryset.filter(valid_until__lt=models.F('valid_from')).update(valid_until=models.F('valid_from'))
+
+
+def populate_date_bounds(apps, schema_editor):
+    for model_name in DATEFRAMEABLE_MODELS:
+        model = apps.get_model('datafetch', model_name)
+        update_date_bounds(model.objects.all())
+
+
+def create_range_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE INDEX datafetch_membership_validity ON datafetch_membership "
+        "USING gist (daterange(valid_from, valid_until, '[]'))")
+
+
+def drop_range_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS datafetch_membership_validity")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datafetch', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actor',
+            name='valid_from',
+            field=models.DateField(verbose_name='valid from', blank=True, null=True, db_index=True, editable=False, help_text='The earliest date covered by the start date'),
+        ),
+        migrations.AddField(
+            model_name='actor',
+            name='valid_until',
+            field=models.DateField(verbose_name='valid until', blank=True, null=True, db_index=True, editable=False, help_text='The latest date covered by the end date'),
+        ),
+        migrations.AddField(
+            model_name='area',
+            name='valid_from',
+            field=models.DateField(verbose_name='valid from', blank=True, null=True, db_index=True, editable=False, help_text='The earliest date covered by the start date'),
+        ),
+        migrations.AddField(
+            model_name='area',
+            name='valid_until',
+            field=models.DateField(verbose_name='valid until', blank=True, null=True, db_index=True, editable=False, help_text='The latest date covered by the end date'),
+        ),
+        migrations.AddField(
+            model_name='consultancy',
+            name='valid_from',
+            field=models.DateField(verbose_name='valid from', blank=True, null=True, db_index=True, editable=False, help_text='The earliest date covered by the start date'),
+        ),
+        migrations.AddField(
+            model_name='consultancy',
+            name='valid_until',
+            field=models.DateField(verbose_name='valid until', blank=True, null=True, db_index=True, editable=False, help_text='The latest date covered by the end date'),
+        ),
+        migrations.AddField(
+            model_name='contactdetail',
+            name='valid_from',
+            field=models.DateField(verbose_name='valid from', blank=True, null=True, db_index=True, editable=False, help_text='The earliest date covered by the start date'),
+        ),
+        migrations.AddField(
+            model_name='contactdetail',
+            name='valid_until',
+            field=models.DateField(verbose_name='valid until', blank=True, null=True, db_index=True, editable=False, help_text='The latest date covered by the end date'),
+        ),
+        migrations.AddField(
+            model_name='donation',
+            name='valid_from',
+            field=models.DateField(verbose_name='valid from', blank=True, null=True, db_index=True, editable=False, help_text='The earliest date covered by the start date'),
+        ),
+        migrations.AddField(
+            model_name='donation',
+            name='valid_until',
+            field=models.DateField(verbose_name='valid until', blank=True, null=True, db_index=True, editable=False, help_text='The latest date covered by the end date'),
+        ),
+        migrations.AddField(
+            model_name='membership',
+            name='valid_from',
+            field=models.DateField(verbose_name='valid from', blank=True, null=True, db_index=True, editable=False, help_text='The earliest date covered by the start date'),
+        ),
+        migrations.AddField(
+            model_name='membership',
+            name='valid_until',
+            field=models.DateField(verbose_name='valid until', blank=True, null=True, db_index=True, editable=False, help_text='The latest date covered by the end date'),
+        ),
+        migrations.AddField(
+            model_name='othername',
+            name='valid_from',
+            field=models.DateField(verbose_name='valid from', blank=True, null=True, db_index=True, editable=False, help_text='The earliest date covered by the start date'),
+        ),
+        migrations.AddField(
+            model_name='othername',
+            name='valid_until',
+            field=models.DateField(verbose_name='valid until', blank=True, null=True, db_index=True, editable=False, help_text='The latest date covered by the end date'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='valid_from',
+            field=models.DateField(verbose_name='valid from', blank=True, null=True, db_index=True, editable=False, help_text='The earliest date covered by the start date'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='valid_until',
+            field=models.DateField(verbose_name='valid until', blank=True, null=True, db_index=True, editable=False, help_text='The latest date covered by the end date'),
+        ),
+        migrations.AlterIndexTogether(
+            name='membership',
+            index_together=set([('role', 'valid_from', 'valid_until')]),
+        ),
+        migrations.RunPython(populate_date_bounds, migrations.RunPython.noop),
+        migrations.RunPython(create_range_index, drop_range_index),
+    ]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datafetch', '0002_dateframeable_bounds'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='consultancy',
+            index_together=set([
+                ('agency', 'client', 'id'),
+                ('agency', 'valid_from', 'id'),
+                ('agency', 'valid_until', 'id'),
+                ('client', 'agency', 'id'),
+                ('client', 'valid_from', 'id'),
+                ('client', 'valid_until', 'id'),
+            ]),
+        ),
+        migrations.AlterIndexTogether(
+            name='donation',
+            index_together=set([
+                ('donor', 'accepted_date', 'id'),
+                ('donor', 'donation_type', 'id'),
+                ('donor', 'nature_of_donation', 'id'),
+                ('donor', 'recipient', 'id'),
+                ('donor', 'reported_date', 'id'),
+                ('donor', 'value', 'id'),
+                ('recipient', 'accepted_date', 'id'),
+                ('recipient', 'donation_type', 'id'),
+                ('recipient', 'donor', 'id'),
+                ('recipient', 'nature_of_donation', 'id'),
+                ('recipient', 'reported_date', 'id'),
+                ('recipient', 'value', 'id'),
+            ]),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.template.defaultfilters import slugify
+
+
+# (a frozen copy of update_actor_slugs from datafetch.models.models, so
+# that changes to it don't change what this migration does)
+def update_actor_slugs(queryset):
+    names = queryset.order_by().values_list('name', flat=True).distinct()
+    for name in list(names):
+        queryset.filter(name=name).update(slug=slugify(name))
+
+
+def populate_kind_and_slug(apps, schema_editor):
+    Actor = apps.get_model('datafetch', 'Actor')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    for ctype in ContentType.objects.filter(app_label='datafetch', model__in=('person', 'organization')):
+        Actor.objects.filter(polymorphic_ctype=ctype).update(kind=ctype.model)
+    update_actor_slugs(Actor.objects.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('datafetch', '0003_relationship_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actor',
+            name='kind',
+            field=models.CharField(verbose_name='kind', max_length=32, blank=True, editable=False, choices=[('person', 'Person'), ('organization', 'Organization')], help_text='Whether this is a person or an organization'),
+        ),
+        migrations.AddField(
+            model_name='actor',
+            name='slug',
+            field=models.SlugField(verbose_name='slug', max_length=512, blank=True, editable=False, help_text='The name, as used in URLs', db_index=False),
+        ),
+        migrations.RunPython(populate_kind_and_slug, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datafetch', '0004_actor_kind_and_slug'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonationRollup',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('role', models.CharField(verbose_name='role', max_length=16, choices=[('recipient', 'Recipient'), ('donor', 'Donor')])),
+                ('month', models.DateField(verbose_name='month', null=True)),
+                ('donation_type', models.CharField(verbose_name='donation type', max_length=128)),
+                ('nature_of_donation', models.CharField(verbose_name='nature of donation', max_length=128, blank=True)),
+                ('count', models.PositiveIntegerField(verbose_name='count')),
+                ('total', models.DecimalField(verbose_name='total', max_digits=14, decimal_places=2)),
+                ('min_value', models.DecimalField(verbose_name='min value', max_digits=12, decimal_places=2)),
+                ('max_value', models.DecimalField(verbose_name='max value', max_digits=12, decimal_places=2)),
+                ('histogram', models.TextField(verbose_name='histogram')),
+                ('max_donation_id', models.IntegerField(verbose_name='max donation id', db_index=True)),
+                ('actor', models.ForeignKey(null=True, related_name='donation_rollups', to='datafetch.Actor')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='donationrollup',
+            unique_together=set([('actor', 'role', 'month', 'donation_type', 'nature_of_donation')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='donationrollup',
+            index_together=set([('role', 'month')]),
+        ),
+    ]
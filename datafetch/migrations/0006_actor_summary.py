@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+
+def populate_actor_summaries(apps, schema_editor):
+    # the actor page reads its counts from here from now on,
+    # so fill it in rather than waiting for the next import
+    ActorSummary = apps.get_model('datafetch', 'ActorSummary')
+    Donation = apps.get_model('datafetch', 'Donation')
+    Consultancy = apps.get_model('datafetch', 'Consultancy')
+    now = timezone.now()
+    summaries = {}
+    for prefix, model, fk in (
+            ('donations_from', Donation, 'recipient_id'),
+            ('donations_to', Donation, 'donor_id'),
+            ('consulting_clients', Consultancy, 'agency_id'),
+            ('consulting_agencies', Consultancy, 'client_id')):
+        rows = model.objects.exclude(**{fk: None}).values(fk).order_by()
+        if model is Donation:
+            rows = rows.annotate(count=Count('id'), total=Sum('value'))
+        else:
+            rows = rows.annotate(count=Count('id'))
+        for row in rows:
+            summary = summaries.setdefault(row[fk], ActorSummary(actor_id=row[fk], refreshed_at=now))
+            setattr(summary, '{}_count'.format(prefix), row['count'])
+            if 'total' in row:
+                setattr(summary, '{}_total'.format(prefix), row['total'] or 0)
+    ActorSummary.objects.bulk_create(summaries.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datafetch', '0005_donation_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActorSummary',
+            fields=[
+                ('actor', models.OneToOneField(primary_key=True, serialize=False, related_name='relationship_summary', to='datafetch.Actor')),
+                ('donations_from_count', models.PositiveIntegerField(verbose_name='donations received', default=0)),
+                ('donations_from_total', models.DecimalField(verbose_name='total received', default=0, max_digits=14, decimal_places=2)),
+                ('donations_to_count', models.PositiveIntegerField(verbose_name='donations made', default=0)),
+                ('donations_to_total', models.DecimalField(verbose_name='total donated', default=0, max_digits=14, decimal_places=2)),
+                ('consulting_clients_count', models.PositiveIntegerField(verbose_name='consulting clients', default=0)),
+                ('consulting_agencies_count', models.PositiveIntegerField(verbose_name='consulting agencies', default=0)),
+                ('refreshed_at', models.DateTimeField(verbose_name='refreshed at', db_index=True)),
+            ],
+        ),
+        migrations.RunPython(populate_actor_summaries, migrations.RunPython.noop),
+    ]
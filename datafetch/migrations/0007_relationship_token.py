@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# (a frozen copy of indexed_tokens from datafetch.names, so that changes
+# to the normalisation don't change what this migration does)
+_PHRASES = [
+    (re.compile(r'\bpublic limited company\b'), 'plc'),
+    (re.compile(r'\blimited liability partnership\b'), 'llp'),
+    (re.compile(r'&'), ' and '),
+    (re.compile(r"['’]"), ''),
+]
+_SYNONYMS = {
+    'limited': 'ltd',
+    'company': 'co',
+    'corporation': 'corp',
+    'incorporated': 'inc',
+    'saint': 'st',
+}
+_STOPWORDS = {'the'}
+_word_re = re.compile(r'\w+', re.UNICODE)
+
+
+def indexed_tokens(name):
+    decomposed = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+    for pattern, replacement in _PHRASES:
+        name = pattern.sub(replacement, name)
+    words = [word for word in _word_re.findall(name) if word not in _STOPWORDS]
+    return set(words) | set(_SYNONYMS.get(word, word) for word in words)
+
+
+def populate_relationship_tokens(apps, schema_editor):
+    # relationship list searches go through this from now on,
+    # so fill it in rather than waiting for the next import
+    RelationshipToken = apps.get_model('datafetch', 'RelationshipToken')
+    Donation = apps.get_model('datafetch', 'Donation')
+    Consultancy = apps.get_model('datafetch', 'Consultancy')
+    for relationship, model, fk, counterpart in (
+            ('donations_from', Donation, 'recipient', 'donor'),
+            ('donations_to', Donation, 'donor', 'recipient'),
+            ('consulting_clients', Consultancy, 'agency', 'client'),
+            ('consulting_agencies', Consultancy, 'client', 'agency')):
+        rows = model.objects.exclude(**{fk: None}).exclude(**{counterpart: None}).values_list(
+            '{}_id'.format(fk), '{}_id'.format(counterpart), '{}__name'.format(counterpart))
+        tokens = []
+        for actor_id, counterpart_id, name in rows.order_by().distinct().iterator():
+            tokens += [RelationshipToken(actor_id=actor_id, relationship=relationship, token=token[:128],
+                                         counterpart_id=counterpart_id)
+                       for token in indexed_tokens(name)]
+        RelationshipToken.objects.bulk_create(tokens)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datafetch', '0006_actor_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelationshipToken',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('relationship', models.CharField(verbose_name='relationship', max_length=32, choices=[('donations_from', 'Donations received'), ('donations_to', 'Donations made'), ('consulting_clients', 'Consulting clients'), ('consulting_agencies', 'Consulting agencies')])),
+                ('token', models.CharField(verbose_name='token', max_length=128)),
+                ('actor', models.ForeignKey(related_name='relationship_tokens', to='datafetch.Actor')),
+                ('counterpart', models.ForeignKey(related_name='+', to='datafetch.Actor')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='relationshiptoken',
+            index_together=set([('actor', 'relationship', 'token')]),
+        ),
+        migrations.RunPython(populate_relationship_tokens, migrations.RunPython.noop),
+    ]
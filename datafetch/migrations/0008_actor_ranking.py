@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datafetch', '0007_relationship_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActorRanking',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('kind', models.CharField(verbose_name='kind', max_length=32, blank=True, choices=[('person', 'Person'), ('organization', 'Organization')])),
+                ('recipients', models.PositiveIntegerField(verbose_name='recipients donated to', default=0)),
+                ('donors', models.PositiveIntegerField(verbose_name='donors', default=0)),
+                ('clients', models.PositiveIntegerField(verbose_name='consulting clients', default=0)),
+                ('agencies', models.PositiveIntegerField(verbose_name='consulting agencies', default=0)),
+                ('donated', models.FloatField(verbose_name='total donated', default=0)),
+                ('received', models.FloatField(verbose_name='total received', default=0)),
+                ('pagerank', models.FloatField(verbose_name='PageRank', default=0)),
+                ('influence', models.FloatField(verbose_name='influence', default=0)),
+                ('donor_influence', models.FloatField(verbose_name='donor influence', default=0)),
+                ('co_donation', models.FloatField(verbose_name='co-donation', default=0)),
+                ('co_funding', models.FloatField(verbose_name='co-funding', default=0)),
+                ('refreshed_at', models.DateTimeField(verbose_name='refreshed at')),
+                ('actor', models.OneToOneField(related_name='ranking', to='datafetch.Actor')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='actorranking',
+            index_together=set([('kind', 'agencies', 'id'), ('influence', 'id'), ('donated', 'id'), ('kind', 'donated', 'id'), ('kind', 'donor_influence', 'id'), ('kind', 'clients', 'id'), ('agencies', 'id'), ('clients', 'id'), ('kind', 'co_funding', 'id'), ('co_donation', 'id'), ('kind', 'co_donation', 'id'), ('donor_influence', 'id'), ('kind', 'pagerank', 'id'), ('co_funding', 'id'), ('kind', 'recipients', 'id'), ('pagerank', 'id'), ('kind', 'received', 'id'), ('kind', 'influence', 'id'), ('recipients', 'id'), ('donors', 'id'), ('received', 'id'), ('kind', 'donors', 'id')]),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datafetch', '0008_actor_ranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActorSimilarity',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('role', models.CharField(verbose_name='role', max_length=16, choices=[('recipient', 'Recipient'), ('donor', 'Donor')])),
+                ('score', models.FloatField(verbose_name='score')),
+                ('shared', models.PositiveIntegerField(verbose_name='shared')),
+                ('max_donation_id', models.IntegerField(verbose_name='max donation id', db_index=True)),
+                ('actor', models.ForeignKey(related_name='similarities', to='datafetch.Actor')),
+                ('similar', models.ForeignKey(related_name='+', to='datafetch.Actor')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='actorsimilarity',
+            index_together=set([('actor', 'role', 'score')]),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+# (a frozen copy of closure_links from datafetch.models.hierarchies, so
+# that changes to it don't change what this migration does)
+def closure_links(parents):
+    ancestors = {}
+    for start in parents:
+        path, on_path, node = [], set(), start
+        while node not in ancestors:
+            path.append(node)
+            on_path.add(node)
+            parent = parents[node]
+            if parent is None or parent not in parents or parent in on_path:
+                ancestors[path.pop()] = []
+                break
+            node = parent
+        for child in reversed(path):
+            parent = parents[child]
+            ancestors[child] = [(parent, 1)] + [(x, depth + 1) for x, depth in ancestors[parent]]
+    links = {}
+    for node, node_ancestors in ancestors.items():
+        links[(node, node)] = 0
+        for ancestor, depth in node_ancestors:
+            links[(ancestor, node)] = depth
+    return links
+
+
+def populate_closures(apps, schema_editor):
+    # subtree filters go through these from now on, so fill them in
+    # rather than waiting for the next import
+    for model_name, closure_name in (('Organization', 'OrganizationClosure'), ('Area', 'AreaClosure')):
+        model = apps.get_model('datafetch', model_name)
+        closure = apps.get_model('datafetch', closure_name)
+        links = closure_links(dict(model.objects.values_list('id', 'parent_id')))
+        closure.objects.bulk_create([
+            closure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth)
+            for (ancestor_id, descendant_id), depth in links.items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datafetch', '0009_actor_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AreaClosure',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('depth', models.PositiveSmallIntegerField(verbose_name='depth')),
+                ('ancestor', models.ForeignKey(related_name='descendant_links', to='datafetch.Area')),
+                ('descendant', models.ForeignKey(related_name='ancestor_links', to='datafetch.Area')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrganizationClosure',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('depth', models.PositiveSmallIntegerField(verbose_name='depth')),
+                ('ancestor', models.ForeignKey(related_name='descendant_links', to='datafetch.Organization')),
+                ('descendant', models.ForeignKey(related_name='ancestor_links', to='datafetch.Organization')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='organizationclosure',
+            unique_together=set([('ancestor', 'descendant')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='organizationclosure',
+            index_together=set([('descendant', 'depth')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='areaclosure',
+            unique_together=set([('ancestor', 'descendant')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='areaclosure',
+            index_together=set([('descendant', 'depth')]),
+        ),
+        migrations.RunPython(populate_closures, migrations.RunPython.noop),
+    ]
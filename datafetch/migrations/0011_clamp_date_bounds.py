@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+DATEFRAMEABLE_MODELS = ('Actor', 'Area', 'Consultancy', 'ContactDetail', 'Donation', 'Membership', 'OtherName', 'Post')
+
+
+def clamp_date_bounds(apps, schema_editor):
+    # items that end before they start are now taken to be valid on
+    # their start date only (see Dateframeable.set_date_bounds)
+    for model_name in DATEFRAMEABLE_MODELS:
+        model = apps.get_model('datafetch', model_name)
+        model.objects.filter(valid_until__lt=models.F('valid_from')).update(valid_until=models.F('valid_from'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datafetch', '0010_hierarchy_closures'),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_date_bounds, migrations.RunPython.noop),
+    ]
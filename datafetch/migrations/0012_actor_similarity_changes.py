@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datafetch', '0011_clamp_date_bounds'),
+    ]
+
+    # (existing similarities get no donations, so the next refresh is
+    # a full one)
+    operations = [
+        migrations.AddField(
+            model_name='actorsimilarity',
+            name='num_donations',
+            field=models.PositiveIntegerField(default=0, verbose_name='number of donations'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='actorsimilarity',
+            name='refreshed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='refreshed at'),
+            preserve_default=False,
+        ),
+    ]
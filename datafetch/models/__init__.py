@@ -1,2 +1,5 @@
-from .models import Post, Identifier, OtherName, ContactDetail, Link, Source, Membership, Person, Organization, Actor
+from .models import Post, Identifier, OtherName, ContactDetail, Link, Source, Membership, Person, Organization, Area, Actor, actor_url, update_actor_slugs
 from .influence_mapping import Relationship, Consultancy, Donation, Note
+from .rollups import DonationRollup, ActorSummary, RelationshipToken, refresh_donation_rollups, refresh_actor_summaries, filter_by_counterpart
+from .rankings import ActorRanking, RANKING_SCORES, refresh_actor_rankings, ActorSimilarity, refresh_actor_similarities
+from .hierarchies import OrganizationClosure, AreaClosure, refresh_closure, refresh_closures, subtree_q
@@ -0,0 +1,157 @@
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils.translation import ugettext_lazy as _
+
+from datafetch.models import models as popolo_models
+
+
+class OrganizationClosure(models.Model):
+    """
+    A link from an organization to one of its descendants (its children,
+    their children, ...), or to itself with depth 0, so that everything
+    under an organization (e.g. a party's accounting units) is one
+    indexed lookup rather than a query per level of Organization.parent.
+
+    This is kept up to date when an organization is saved (see
+    `update_closure`), and by `refresh_closures` after bulk changes.
+    """
+    ancestor = models.ForeignKey(popolo_models.Organization, related_name='descendant_links')
+    descendant = models.ForeignKey(popolo_models.Organization, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField(_("depth"))
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        index_together = [('descendant', 'depth')]
+
+
+class AreaClosure(models.Model):
+    """
+    A link from an area to one of its descendants, or to itself with
+    depth 0 (see OrganizationClosure).
+    """
+    ancestor = models.ForeignKey(popolo_models.Area, related_name='descendant_links')
+    descendant = models.ForeignKey(popolo_models.Area, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField(_("depth"))
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        index_together = [('descendant', 'depth')]
+
+
+# model with a parent -> its closure table
+CLOSURES = {
+    popolo_models.Organization: OrganizationClosure,
+    popolo_models.Area: AreaClosure,
+}
+
+
+def closure_links(parents):
+    """
+    Return {(ancestor id, descendant id): depth} for the hierarchy
+    given by `parents` ({id: parent id, or None}), including each node
+    as its own ancestor. A parent that's missing, or that would make a
+    node its own ancestor, is ignored.
+    """
+    # id -> [(ancestor id, depth)], not including itself
+    ancestors = {}
+    for start in parents:
+        path, on_path, node = [], set(), start
+        # walk up to the first node whose ancestors are known (or a root)
+        while node not in ancestors:
+            path.append(node)
+            on_path.add(node)
+            parent = parents[node]
+            if parent is None or parent not in parents or parent in on_path:
+                ancestors[path.pop()] = []
+                break
+            node = parent
+        for child in reversed(path):
+            parent = parents[child]
+            ancestors[child] = [(parent, 1)] + [(x, depth + 1) for x, depth in ancestors[parent]]
+    links = {}
+    for node, node_ancestors in ancestors.items():
+        links[(node, node)] = 0
+        for ancestor, depth in node_ancestors:
+            links[(ancestor, node)] = depth
+    return links
+
+
+def refresh_closure(model, batch_size=500):
+    """
+    Bring the closure table of `model` (Organization or Area) into line
+    with its parents, e.g. after they've been changed in bulk, adding
+    and deleting just the links that have changed. Returns the number
+    of links changed.
+    """
+    closure = CLOSURES[model]
+    wanted = closure_links(dict(model.objects.values_list('id', 'parent_id')))
+    existing = list(closure.objects.values_list('id', 'ancestor_id', 'descendant_id', 'depth'))
+    stale = [pk for pk, ancestor_id, descendant_id, depth in existing
+             if wanted.get((ancestor_id, descendant_id)) != depth]
+    current = {(ancestor_id, descendant_id): depth for pk, ancestor_id, descendant_id, depth in existing}
+    new = [closure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth)
+           for (ancestor_id, descendant_id), depth in wanted.items()
+           if current.get((ancestor_id, descendant_id)) != depth]
+    with transaction.atomic():
+        for idx in range(0, len(stale), batch_size):
+            closure.objects.filter(id__in=stale[idx:idx + batch_size]).delete()
+        closure.objects.bulk_create(new)
+    return len(stale) + len(new)
+
+
+def refresh_closures():
+    """
+    Refresh every closure table. Returns the number of links changed.
+    """
+    return sum(refresh_closure(model) for model in CLOSURES)
+
+
+def check_parent(sender, instance, raw=False, **kwargs):
+    """
+    Before an organization or area is saved, refuse a parent that's
+    itself or one of its descendants.
+    """
+    if raw or instance.pk is None or instance.parent_id is None:
+        return
+    if CLOSURES[sender].objects.filter(ancestor_id=instance.pk, descendant_id=instance.parent_id).exists():
+        raise ValueError("{} can't be its own ancestor".format(instance))
+
+
+def update_closure(sender, instance, created, raw=False, **kwargs):
+    """
+    After an organization or area is saved, link it (and its
+    descendants) to its new ancestors, if its parent has changed.
+    """
+    if raw:
+        return
+    closure = CLOSURES[sender]
+    if created and instance.parent_id is None:
+        closure.objects.create(ancestor_id=instance.pk, descendant_id=instance.pk, depth=0)
+        return
+    if not created:
+        # depth -> ancestor id, for itself and its recorded parent
+        recorded = dict(closure.objects.filter(descendant_id=instance.pk, depth__lte=1).values_list('depth', 'ancestor_id'))
+        if recorded.get(0) == instance.pk and recorded.get(1) == instance.parent_id:
+            return
+    with transaction.atomic():
+        if created or not closure.objects.filter(ancestor_id=instance.pk, descendant_id=instance.pk).exists():
+            closure.objects.create(ancestor_id=instance.pk, descendant_id=instance.pk, depth=0)
+        subtree = list(closure.objects.filter(ancestor_id=instance.pk).values_list('descendant_id', 'depth'))
+        subtree_ids = closure.objects.filter(ancestor_id=instance.pk).values('descendant_id')
+        # detach it from its old ancestors
+        closure.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if instance.parent_id is not None:
+            ancestors = closure.objects.filter(descendant_id=instance.parent_id).values_list('ancestor_id', 'depth')
+            closure.objects.bulk_create([
+                closure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + depth + 1)
+                for ancestor_id, ancestor_depth in ancestors for descendant_id, depth in subtree
+            ])
+
+
+def subtree_q(field, actor_id):
+    """
+    A Q matching rows whose `field` (an actor foreign key) is `actor_id`,
+    or, if that's an organization, any organization under it.
+    """
+    descendants = OrganizationClosure.objects.filter(ancestor_id=actor_id).values('descendant_id')
+    return Q(**{field: actor_id}) | Q(**{'{}__in'.format(field): descendants})
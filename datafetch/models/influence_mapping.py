@@ -40,6 +40,16 @@ class Consultancy(Relationship):
     client = models.ForeignKey(popolo_models.Actor, related_name='consulting_agencies', null=True)
     agency = models.ForeignKey(popolo_models.Actor, related_name='consulting_clients', null=True)
 
+    class Meta:
+        # The relationship lists filter on one actor and sort on one
+        # of these columns (see api.views.CONSULTANCY_ORDERINGS), so each
+        # (actor, sort column) pair gets an index, with id as a tie-breaker.
+        index_together = [
+            (fk, column, 'id')
+            for fk, other in (('client', 'agency'), ('agency', 'client'))
+            for column in ('valid_from', 'valid_until', other)
+        ]
+
 
 class Donation(Relationship):
     CATEGORY_CHOICES = (
@@ -90,6 +100,16 @@ class Donation(Relationship):
     is_aggregation = models.BooleanField(_("is aggregation"))
     is_sponsorship = models.BooleanField(_("is sponsorship"))
 
+    class Meta:
+        # The relationship lists filter on one actor and sort on one
+        # of these columns (see api.views.DONATION_ORDERINGS), so each
+        # (actor, sort column) pair gets an index, with id as a tie-breaker.
+        index_together = [
+            (fk, column, 'id')
+            for fk, other in (('recipient', 'donor'), ('donor', 'recipient'))
+            for column in ('reported_date', 'accepted_date', 'value', 'donation_type', 'nature_of_donation', other)
+        ]
+
     def start_date(self):
         return self.accepted_date
 
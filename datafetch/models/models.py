@@ -17,10 +17,61 @@ from .popolo.behaviors import Timestampable, Dateframeable, GenericRelatable
 from .popolo.querysets import PostQuerySet, OtherNameQuerySet, ContactDetailQuerySet, MembershipQuerySet, SubclassingQuerySet
 
 
+# kind -> URL template, filled in lazily (the URLconf
+# can't be used while models are being loaded)
+_actor_url_templates = {}
+
+def actor_url(kind, pk, slug, absolute=True):
+    """
+    Build the URL of an actor's page from its kind, id and slug.
+
+    This is called for every actor in every API response, so rather
+    than calling ``reverse()`` each time, it reverses each kind of
+    actor page once and fills in the rest with string formatting.
+    """
+    template = _actor_url_templates.get(kind)
+    if template is None:
+        # slugs and ids can never contain these placeholders
+        path = reverse('{}-detail'.format(kind), kwargs={"pk": 987654321, "slug": "SLUG"})
+        template = path.replace("987654321", "{pk}").replace("SLUG", "{slug}")
+        _actor_url_templates[kind] = template
+    path = template.format(pk=pk, slug=slug)
+    return BASE_URL + path if absolute else path
+
+
+def update_actor_slugs(queryset):
+    """
+    Recompute the stored slug for every actor in a queryset, e.g.
+    after a bulk_create or an update() of names (which don't send
+    pre_save). Issues one UPDATE per distinct name.
+    """
+    names = queryset.order_by().values_list('name', flat=True).distinct()
+    for name in list(names):
+        queryset.filter(name=name).update(slug=slugify(name))
+
+
 class Actor(PolymorphicModel, Dateframeable, Timestampable, GenericRelatable):
+    """
+    A person or organization.
+
+    Querying Actor polymorphically costs an extra query per concrete
+    subclass, to upcast each row. Where only the name and URL are
+    needed, use ``Actor.objects.non_polymorphic()`` (or select_related)
+    instead: ``kind`` and ``slug`` are stored on the Actor row, so
+    ``url()`` works without upcasting.
+    """
+    KINDS = Choices(
+        ('person', _('Person')),
+        ('organization', _('Organization')),
+    )
+
     name = models.CharField(_("name"), max_length=512, help_text=_("A person or organization's preferred full name"))
     image = models.URLField(_("image"), blank=True, null=True, help_text=_("An image representing the person or organization"))
 
+    # denormalized from the concrete subclass and name on save
+    kind = models.CharField(_("kind"), max_length=32, choices=KINDS, blank=True, editable=False, help_text=_("Whether this is a person or an organization"))
+    slug = models.SlugField(_("slug"), max_length=512, blank=True, editable=False, db_index=False, help_text=_("The name, as used in URLs"))
+
     # array of items referencing "http://popoloproject.com/schemas/other_name.json#"
     other_names = GenericRelation('OtherName', help_text="Alternate or former names")
 
@@ -51,11 +102,12 @@ class Actor(PolymorphicModel, Dateframeable, Timestampable, GenericRelatable):
         for c in contacts:
             self.add_contact_detail(**c)
 
+    @property
+    def url_name(self):
+        return '{}-detail'.format(self.kind)
+
     def url(self):
-        return BASE_URL + reverse(self.url_name, kwargs={
-            "pk": self.id,
-            "slug": slugify(self.name),
-        })
+        return actor_url(self.kind, self.id, self.slug)
 
 class Person(Actor):
     """
@@ -228,6 +280,12 @@ class Membership(Dateframeable, Timestampable, models.Model):
 
     objects = PassThroughManager.for_queryset_class(MembershipQuerySet)()
 
+    class Meta:
+        index_together = [
+            # "who held this role on date X" is a range scan on this
+            ('role', 'valid_from', 'valid_until'),
+        ]
+
     def __str__(self):
         return self.role
 
@@ -410,6 +468,18 @@ def copy_person_date_fields(sender, **kwargs):
         obj.end_date = obj.death_date
 
 
+## store the kind of actor and its slug on the Actor row,
+## so that neither needs an upcast to work out. (Plain Actors,
+## e.g. from non_polymorphic(), already know their kind.)
+@receiver(pre_save, sender=Actor)
+@receiver(pre_save, sender=Person)
+@receiver(pre_save, sender=Organization)
+def set_actor_kind_and_slug(sender, **kwargs):
+    obj = kwargs['instance']
+    if sender is not Actor:
+        obj.kind = sender._meta.model_name
+    obj.slug = slugify(obj.name)
+
 ## all instances are validated before being saved
 @receiver(pre_save, sender=Person)
 @receiver(pre_save, sender=Organization)
@@ -417,3 +487,14 @@ def copy_person_date_fields(sender, **kwargs):
 def validate_date_fields(sender, **kwargs):
     obj = kwargs['instance']
     obj.full_clean()
+
+## keep the normalized date bounds in sync with the partial
+## start and end dates. This is registered last, so that it
+## sees the dates copied across above.
+## Bulk loads (which don't send pre_save) should call
+## update_date_bounds on the affected rows.
+@receiver(pre_save)
+def set_date_bounds(sender, **kwargs):
+    obj = kwargs['instance']
+    if isinstance(obj, Dateframeable):
+        obj.set_date_bounds()
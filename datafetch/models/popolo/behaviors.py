@@ -1,4 +1,5 @@
-from datetime import datetime, time
+import calendar
+from datetime import date, datetime, time
 
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
@@ -41,10 +42,55 @@ def validate_partial_date(value):
                 raise ValidationError(u'date seems not to be correct %s' % value)
 
 
+def partial_date_bounds(value):
+    """
+    Return the earliest and latest dates covered by a partial date,
+    e.g. "2010" -> (2010-01-01, 2010-12-31), "2010-02" -> (2010-02-01, 2010-02-28).
+    An empty value gives (None, None); an invalid one raises ValueError.
+    """
+    if not value:
+        return None, None
+    parts = [int(x) for x in value.split('-')]
+    if len(parts) == 1:
+        return date(parts[0], 1, 1), date(parts[0], 12, 31)
+    if len(parts) == 2:
+        last_day = calendar.monthrange(parts[0], parts[1])[1]
+        return date(parts[0], parts[1], 1), date(parts[0], parts[1], last_day)
+    if len(parts) == 3:
+        d = date(*parts)
+        return d, d
+    raise ValueError("date seems not to be correct %s" % value)
+
+
+def update_date_bounds(queryset):
+    """
+    Recompute ``valid_from`` and ``valid_until`` for every row in a
+    queryset of a Dateframeable model, e.g. after a ``bulk_create`` or
+    ``update`` (which don't send ``pre_save``). This issues one UPDATE
+    per distinct start / end date, rather than one per row.
+
+    An end before the start is clamped to the start (see
+    ``Dateframeable.set_date_bounds``).
+    """
+    for field, bound, idx in (('start_date', 'valid_from', 0), ('end_date', 'valid_until', 1)):
+        values = queryset.order_by().values_list(field, flat=True).distinct()
+        for value in list(values):
+            try:
+                bound_value = partial_date_bounds(value)[idx]
+            except ValueError:
+                bound_value = None
+            queryset.filter(**{field: value}).update(**{bound: bound_value})
+    queryset.filter(valid_until__lt=models.F('valid_from')).update(valid_until=models.F('valid_from'))
+
+
 class Dateframeable(models.Model):
     """
     An abstract base class model that provides a start and an end dates to the class.
     Uncomplete dates can be used. The validation pattern is: "^[0-9]{4}(-[0-9]{2}){0,2}$"
+
+    ``valid_from`` and ``valid_until`` hold the earliest start and the latest
+    end covered by the (possibly partial) dates, so that date range queries
+    compare real, indexed dates rather than strings.
     """
     partial_date_validator = RegexValidator(regex="^[0-9]{4}(-[0-9]{2}){0,2}$", message="Date has wrong format")
 
@@ -59,6 +105,33 @@ class Dateframeable(models.Model):
         help_text=_("The date when the validity of the item ends")
     )
 
+    valid_from = models.DateField(
+        _("valid from"), blank=True, null=True, editable=False, db_index=True,
+        help_text=_("The earliest date covered by the start date"),
+    )
+    valid_until = models.DateField(
+        _("valid until"), blank=True, null=True, editable=False, db_index=True,
+        help_text=_("The latest date covered by the end date"),
+    )
+
+    def set_date_bounds(self):
+        """
+        Derive ``valid_from`` and ``valid_until`` from the partial start and end dates.
+        """
+        try:
+            self.valid_from = partial_date_bounds(self.start_date)[0]
+        except ValueError:
+            self.valid_from = None
+        try:
+            self.valid_until = partial_date_bounds(self.end_date)[1]
+        except ValueError:
+            self.valid_until = None
+        # some sources have the end before the start; the validity range
+        # (and its index on Membership) needs start <= end, so such an
+        # item is taken to be valid on its start date only
+        if self.valid_from and self.valid_until and self.valid_until < self.valid_from:
+            self.valid_until = self.valid_from
+
     @property
     def start_datetime(self):
         if len(self.start_date) < 7:
@@ -3,9 +3,24 @@ from django.db.models.query import QuerySet
 
 __author__ = 'guglielmo'
 
-from django.db import models
-from datetime import datetime
+from django.db import connections, models
+from datetime import date
 
+from .behaviors import partial_date_bounds, update_date_bounds
+
+
+
+def parse_moment(moment=None):
+    """
+    Turn a moment (a date, or a possibly partial date string in the
+    YYYY-MM-DD format) into a date; defaults to today.
+    Raises ValueError for an invalid string.
+    """
+    if moment is None:
+        return date.today()
+    if isinstance(moment, date):
+        return moment
+    return partial_date_bounds(moment)[0]
 
 
 class DateframeableQuerySet(models.query.QuerySet):
@@ -15,42 +30,40 @@ class DateframeableQuerySet(models.query.QuerySet):
 
     Here, a *Dateframeable model* denotes a model class having an associated date range.
 
-    We assume that the date range is described by two ``Char`` fields
-    named ``start_date`` and ``end_date``, respectively,
-    whose validation pattern is: "^[0-9]{4}(-[0-9]{2}){0,2}$",
-    in order to represent partial dates.
+    The date range is described by two ``Char`` fields named ``start_date`` and
+    ``end_date``, whose validation pattern is: "^[0-9]{4}(-[0-9]{2}){0,2}$",
+    in order to represent partial dates. Queries use the indexed ``valid_from``
+    and ``valid_until`` bounds derived from them, so e.g. an end date of "2010"
+    counts as current on 2010-05-06.
     """
     def past(self, moment=None):
         """
         Return a QuerySet containing the *past* instances of the model
         (i.e. those having an end date which is in the past).
         """
-        if moment is None:
-            moment = datetime.strftime(datetime.now(), '%Y-%m-%d')
-        return self.filter(end_date__lte=moment)
+        return self.filter(valid_until__lte=parse_moment(moment))
 
     def future(self, moment=None):
         """
         Return a QuerySet containing the *future* instances of the model
         (i.e. those having a start date which is in the future).
         """
-        if moment is None:
-            moment = datetime.strftime(datetime.now(), '%Y-%m-%d')
-        return self.filter(start_date__gte=moment)
+        return self.filter(valid_from__gte=parse_moment(moment))
 
     def current(self, moment=None):
         """
         Return a QuerySet containing the *current* instances of the model
         at the given moment in time, if the parameter is spcified
         now if it is not
-        @moment - is a string, representing a date in the YYYY-MM-DD format
+        @moment - is a date, or a string representing a date in the YYYY-MM-DD format
         (i.e. those for which the moment date-time lies within their associated time range).
         """
-        if moment is None:
-            moment = datetime.strftime(datetime.now(), '%Y-%m-%d')
+        moment = parse_moment(moment)
+        return self.filter(Q(valid_from__lte=moment) &
+                           (Q(valid_until__gte=moment) | Q(valid_until__isnull=True)))
 
-        return self.filter(Q(start_date__lte=moment) &
-                           (Q(end_date__gte=moment) | Q(end_date__isnull=True)))
+    def update_date_bounds(self):
+        update_date_bounds(self)
 
 
 
@@ -74,7 +87,15 @@ class PostQuerySet(DateframeableQuerySet):
     pass
 
 class MembershipQuerySet(DateframeableQuerySet):
-    pass
+    def current(self, moment=None):
+        if connections[self.db].vendor != 'postgresql':
+            return super(MembershipQuerySet, self).current(moment)
+        # use the GiST index over the validity range
+        # (see migration 0002_dateframeable_bounds)
+        return self.filter(valid_from__isnull=False).extra(
+            where=["daterange({0}.valid_from, {0}.valid_until, '[]') @> %s::date".format(self.model._meta.db_table)],
+            params=[parse_moment(moment)],
+        )
 
 class ContactDetailQuerySet(DateframeableQuerySet):
     pass
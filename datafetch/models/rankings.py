@@ -0,0 +1,315 @@
+from itertools import chain
+
+import numpy as np
+from scipy import sparse
+
+from django.db import models, transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+from model_utils import Choices
+
+from datafetch.models import models as popolo_models
+from datafetch.similarity import top_similar
+from .influence_mapping import Consultancy, Donation
+
+
+# the scores the rankings can be sorted by
+RANKING_SCORES = ('recipients', 'donors', 'clients', 'agencies', 'donated', 'received',
+                  'pagerank', 'influence', 'donor_influence', 'co_donation', 'co_funding')
+
+DAMPING = 0.85
+
+
+class ActorRanking(models.Model):
+    """
+    Network scores for an actor with any donations or consultancies,
+    for ranking actors by how central they are to the flow of money and
+    lobbying.
+
+    This is derived from Donation and Consultancy (as a whole, so it's
+    rebuilt rather than updated) by `refresh_actor_rankings`.
+    """
+    actor = models.OneToOneField(popolo_models.Actor, related_name='ranking')
+    # denormalized from the actor, for rankings of one kind
+    kind = models.CharField(_("kind"), max_length=32, choices=popolo_models.Actor.KINDS, blank=True)
+
+    # distinct counterparts
+    recipients = models.PositiveIntegerField(_("recipients donated to"), default=0)
+    donors = models.PositiveIntegerField(_("donors"), default=0)
+    clients = models.PositiveIntegerField(_("consulting clients"), default=0)
+    agencies = models.PositiveIntegerField(_("consulting agencies"), default=0)
+    # weighted degree: the total value of donations
+    donated = models.FloatField(_("total donated"), default=0)
+    received = models.FloatField(_("total received"), default=0)
+    # PageRank over the flow of money (donor to recipient, client to
+    # agency), and over its reverse: how much flows to an actor, and how
+    # much an actor feeds actors that much flows to
+    pagerank = models.FloatField(_("PageRank"), default=0)
+    influence = models.FloatField(_("influence"), default=0)
+    # the total influence of an actor's donors
+    donor_influence = models.FloatField(_("donor influence"), default=0)
+    # the sum of the (cosine) similarities of a donor's recipients to
+    # every other donor's, and of a recipient's donors to every other
+    # recipient's: how much they're part of a bloc
+    co_donation = models.FloatField(_("co-donation"), default=0)
+    co_funding = models.FloatField(_("co-funding"), default=0)
+
+    refreshed_at = models.DateTimeField(_("refreshed at"))
+
+    class Meta:
+        # rankings are sorted by one score, optionally of one kind of
+        # actor, with id as a tie-breaker (see api.views.RankingView)
+        index_together = [(score, 'id') for score in RANKING_SCORES] + \
+                         [('kind', score, 'id') for score in RANKING_SCORES]
+
+
+def _matrix(rows, index, shape):
+    """
+    A sparse matrix from (row id, column id, weight) `rows`, with ids
+    mapped to positions by `index`.
+    """
+    if not rows:
+        return sparse.csr_matrix(shape)
+    source, target, weight = zip(*rows)
+    return sparse.csr_matrix(
+        (np.array(weight, dtype=float), (np.searchsorted(index, source), np.searchsorted(index, target))),
+        shape=shape)
+
+
+def _row_normalize(matrix):
+    sums = np.asarray(matrix.sum(axis=1)).ravel()
+    sums[sums == 0] = 1
+    return sparse.diags(1 / sums).dot(matrix)
+
+
+def pagerank(matrix, damping=DAMPING, tolerance=1e-10, max_iterations=100):
+    """
+    PageRank of the nodes of the weighted graph with (sparse) adjacency
+    `matrix`, by power iteration. Nodes with no outgoing edges spread
+    their rank evenly.
+    """
+    n = matrix.shape[0]
+    if not n:
+        return np.zeros(0)
+    transitions = _row_normalize(matrix).T.tocsr()
+    dangling = np.asarray(matrix.sum(axis=1)).ravel() == 0
+    rank = np.full(n, 1 / n)
+    for iteration in range(max_iterations):
+        previous = rank
+        rank = damping * (transitions.dot(rank) + rank[dangling].sum() / n) + (1 - damping) / n
+        if np.abs(rank - previous).sum() < tolerance:
+            break
+    return rank
+
+
+def _similarity_sums(incidence):
+    """
+    For each row of the binary (sparse) `incidence` matrix, the sum of
+    its cosine similarities with every other row, without forming the
+    row-by-row similarity matrix.
+    """
+    norms = np.sqrt(np.asarray(incidence.sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    normalized = sparse.diags(1 / norms).dot(incidence)
+    column_sums = np.asarray(normalized.sum(axis=0)).ravel()
+    sums = normalized.dot(column_sums)
+    # (less each row's similarity with itself)
+    return np.where(incidence.getnnz(axis=1) > 0, sums - 1, 0)
+
+
+def compute_rankings():
+    """
+    Return (actor ids, {score: array of that score for each actor})
+    for every actor with any donations or consultancies.
+    """
+    donations = list(Donation.objects.exclude(donor=None).exclude(donor_id=models.F('recipient_id'))
+                     .values_list('donor_id', 'recipient_id').order_by().annotate(total=Sum('value')))
+    consultancies = list(Consultancy.objects.exclude(client=None).exclude(agency=None)
+                         .exclude(client_id=models.F('agency_id'))
+                         .values_list('client_id', 'agency_id').order_by().annotate(count=Count('id')))
+    index = np.unique(np.array([x[0] for x in donations + consultancies] +
+                               [x[1] for x in donations + consultancies], dtype=np.int64))
+    shape = (len(index), len(index))
+    money = _matrix([(donor, recipient, float(total or 0)) for donor, recipient, total in donations], index, shape)
+    lobbying = _matrix(consultancies, index, shape)
+    # who gave to whom (whatever the value), and who hired whom
+    gave = _matrix([(donor, recipient, 1) for donor, recipient, total in donations], index, shape)
+    hired = (lobbying > 0).astype(float)
+
+    def counts(matrix, axis):
+        return np.asarray(matrix.sum(axis=axis)).ravel().astype(int)
+
+    def totals(matrix, axis):
+        return np.asarray(matrix.sum(axis=axis)).ravel()
+
+    # money and lobbying count equally towards the flow out of an actor
+    flow = _row_normalize(money) + _row_normalize(lobbying)
+    influence = pagerank(flow.T.tocsr())
+    return index, {
+        'recipients': counts(gave, 1),
+        'donors': counts(gave, 0),
+        'clients': counts(hired, 0),
+        'agencies': counts(hired, 1),
+        'donated': totals(money, 1),
+        'received': totals(money, 0),
+        'pagerank': pagerank(flow),
+        'influence': influence,
+        'donor_influence': gave.T.dot(influence),
+        'co_donation': _similarity_sums(gave),
+        'co_funding': _similarity_sums(gave.T.tocsr()),
+    }
+
+
+def refresh_actor_rankings(batch_size=None):
+    """
+    Recompute every actor's ActorRanking. Returns the number of actors
+    ranked.
+    """
+    started = timezone.now()
+    actor_ids, scores = compute_rankings()
+    kinds = dict(popolo_models.Actor.objects.non_polymorphic().values_list('id', 'kind'))
+    rankings = [
+        ActorRanking(actor_id=int(actor_id), kind=kinds.get(int(actor_id), ''), refreshed_at=started,
+                     **{score: values[idx].item() for score, values in scores.items()})
+        for idx, actor_id in enumerate(actor_ids)
+    ]
+    with transaction.atomic():
+        ActorRanking.objects.all().delete()
+        ActorRanking.objects.bulk_create(rankings, batch_size=batch_size)
+    return len(rankings)
+
+
+class ActorSimilarity(models.Model):
+    """
+    One of the actors most similar to an actor by who they've donated
+    with: for a donor, the donors who also gave to their recipients
+    (role="donor"), and for a recipient, the recipients who were also
+    given to by their donors (role="recipient"). The score is the
+    Jaccard similarity of the two actors' sets of recipients (or
+    donors).
+
+    This is derived from Donation by `refresh_actor_similarities`.
+    """
+    ROLES = Choices(
+        ('recipient', _('Recipient')),
+        ('donor', _('Donor')),
+    )
+
+    actor = models.ForeignKey(popolo_models.Actor, related_name='similarities')
+    role = models.CharField(_("role"), max_length=16, choices=ROLES)
+    similar = models.ForeignKey(popolo_models.Actor, related_name='+')
+    score = models.FloatField(_("score"))
+    # the number of recipients (or donors) the actors have in common
+    shared = models.PositiveIntegerField(_("shared"))
+    # the highest Donation id and the number of donations when this was
+    # refreshed, for incremental refreshes (donations changed since
+    # `refreshed_at`, or fewer donations, mean a full refresh)
+    max_donation_id = models.IntegerField(_("max donation id"), db_index=True)
+    num_donations = models.PositiveIntegerField(_("number of donations"))
+    refreshed_at = models.DateTimeField(_("refreshed at"))
+
+    class Meta:
+        index_together = [('actor', 'role', 'score')]
+
+
+def _incidence(pairs, index, columns):
+    """
+    A binary sparse matrix with a row per id of `index`, a column per
+    id of `columns`, and a 1 for each (row id, column id) of `pairs`.
+    """
+    return sparse.csr_matrix(
+        (np.ones(len(pairs)), (np.searchsorted(index, pairs[:, 0]), np.searchsorted(columns, pairs[:, 1]))),
+        shape=(len(index), len(columns)))
+
+
+def _similarities(incidence, index, rows, role, **fields):
+    """
+    Yield lists of the ActorSimilarities (with `fields`) of the actors
+    at `rows` of `incidence` (or every row), a chunk of actors at a time.
+    """
+    for chunk in top_similar(incidence, rows=rows):
+        yield [ActorSimilarity(actor_id=int(index[row]), role=role, similar_id=int(index[other]),
+                               score=score.item(), shared=shared.item(), **fields)
+               for row, other, score, shared in zip(*chunk)]
+
+
+def _positions(index, actor_ids):
+    """
+    The positions in `index` of those of `actor_ids` that are in it.
+    """
+    actor_ids = np.array(sorted(actor_ids), dtype=np.int64)
+    positions = np.searchsorted(index, actor_ids)
+    found = positions < len(index)
+    found[found] = index[positions[found]] == actor_ids[found]
+    return positions[found]
+
+
+def refresh_actor_similarities(full=False, batch_size=500):
+    """
+    Bring ActorSimilarity up to date. By default only the similarities
+    of the actors involved in donations added since the last refresh
+    (by id) are recomputed, along with those of the actors they share a
+    recipient (or donor) with; with `full`, or if any of the
+    donations seen last time have since been changed or deleted (e.g.
+    by a merge), everything is.
+
+    Returns the number of actors whose similarities were recomputed.
+    """
+    started = timezone.now()
+    donations = Donation.objects.aggregate(m=Max('id'), n=Count('id'))
+    max_donation_id, num_donations = donations['m'] or 0, donations['n']
+    if not max_donation_id:
+        ActorSimilarity.objects.all().delete()
+        return 0
+    watermark = 0
+    last = ActorSimilarity.objects.order_by('-max_donation_id').values(
+        'max_donation_id', 'num_donations', 'refreshed_at').first()
+    if not full and last is not None:
+        seen = Donation.objects.filter(id__lte=last['max_donation_id'])
+        if (seen.count() == last['num_donations'] and
+                not seen.filter(updated_at__gte=last['refreshed_at']).exists()):
+            watermark = last['max_donation_id']
+    if watermark >= max_donation_id:
+        return 0
+    pairs = np.array(list(Donation.objects.exclude(donor=None).exclude(donor_id=models.F('recipient_id'))
+                          .values_list('donor_id', 'recipient_id').order_by().distinct()),
+                     dtype=np.int64).reshape(-1, 2)
+    donors, recipients = np.unique(pairs[:, 0]), np.unique(pairs[:, 1])
+    incidence = {
+        'donor': (_incidence(pairs, donors, recipients), donors),
+        'recipient': (_incidence(pairs[:, ::-1], recipients, donors), recipients),
+    }
+    if watermark:
+        new = Donation.objects.filter(id__gt=watermark).exclude(donor=None).values_list('donor_id', 'recipient_id')
+        affected = {'donor': set(), 'recipient': set()}
+        for donor_id, recipient_id in new.iterator():
+            affected['donor'].add(donor_id)
+            affected['recipient'].add(recipient_id)
+    else:
+        affected = {'donor': None, 'recipient': None}
+
+    fields = {'max_donation_id': max_donation_id, 'num_donations': num_donations, 'refreshed_at': started}
+    num_refreshed = 0
+    for role, (matrix, index) in incidence.items():
+        if affected[role] is None:
+            with transaction.atomic():
+                ActorSimilarity.objects.filter(role=role).delete()
+                for similarities in _similarities(matrix, index, None, role, **fields):
+                    ActorSimilarity.objects.bulk_create(similarities)
+            num_refreshed += len(index)
+            continue
+        # an affected actor's similarity to everyone it shares a
+        # recipient (or donor) with has changed, so they're all
+        # recomputed: it may now belong in (or out of) their lists
+        positions = _positions(index, affected[role])
+        columns = np.unique(matrix[positions].indices)
+        positions = np.union1d(positions, np.flatnonzero(matrix.tocsc()[:, columns].getnnz(axis=1)))
+        similarities = list(chain.from_iterable(_similarities(matrix, index, positions, role, **fields)))
+        actor_ids = index[positions].tolist()
+        with transaction.atomic():
+            for idx in range(0, len(actor_ids), batch_size):
+                ActorSimilarity.objects.filter(role=role, actor_id__in=actor_ids[idx:idx + batch_size]).delete()
+            ActorSimilarity.objects.bulk_create(similarities)
+        num_refreshed += len(actor_ids)
+    return num_refreshed
@@ -0,0 +1,323 @@
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+from model_utils import Choices
+
+from datafetch.models import models as popolo_models
+from datafetch.names import indexed_tokens, name_tokens
+from .hierarchies import subtree_q
+from .influence_mapping import Consultancy, Donation
+
+
+# Upper bounds of the donation value histogram buckets (in £, on a
+# 1-2-5 scale). The last bucket holds everything from £10m up.
+VALUE_BUCKETS = [Decimal(m) * 10 ** e for e in range(0, 7) for m in (1, 2, 5)] + [Decimal(10 ** 7)]
+
+
+def value_bucket(value):
+    return bisect_right(VALUE_BUCKETS, value)
+
+
+def estimate_percentile(histogram, p, min_value, max_value):
+    """
+    Estimate the `p`th percentile (0-100) of a set of values from its
+    histogram (counts per VALUE_BUCKETS bucket), interpolating linearly
+    within the bucket it falls in.
+    """
+    count = sum(histogram)
+    if not count:
+        return None
+    rank = p / 100.0 * count
+    seen = 0
+    for idx, bucket_count in enumerate(histogram):
+        if not bucket_count or seen + bucket_count < rank:
+            seen += bucket_count
+            continue
+        lower = VALUE_BUCKETS[idx - 1] if idx else Decimal(0)
+        upper = VALUE_BUCKETS[idx] if idx < len(VALUE_BUCKETS) else max_value
+        lower, upper = max(lower, min_value), min(upper, max_value)
+        fraction = Decimal((rank - seen) / bucket_count)
+        return (lower + (upper - lower) * fraction).quantize(Decimal('0.01'))
+    return max_value
+
+
+class DonationRollup(models.Model):
+    """
+    Donation counts, totals and value histograms for an actor (as
+    either recipient or donor), per month, donation type and nature
+    of donation. Every donation is counted once with role="recipient",
+    and once more with role="donor" if it has a donor.
+
+    This is derived from Donation by `refresh_donation_rollups`.
+    """
+    ROLES = Choices(
+        ('recipient', _('Recipient')),
+        ('donor', _('Donor')),
+    )
+
+    actor = models.ForeignKey(popolo_models.Actor, related_name='donation_rollups', null=True)
+    role = models.CharField(_("role"), max_length=16, choices=ROLES)
+    # the first of the month the donation was accepted (or, failing
+    # that, reported) in
+    month = models.DateField(_("month"), null=True)
+    donation_type = models.CharField(_("donation type"), max_length=128)
+    nature_of_donation = models.CharField(_("nature of donation"), max_length=128, blank=True)
+
+    count = models.PositiveIntegerField(_("count"))
+    total = models.DecimalField(_("total"), max_digits=14, decimal_places=2)
+    min_value = models.DecimalField(_("min value"), max_digits=12, decimal_places=2)
+    max_value = models.DecimalField(_("max value"), max_digits=12, decimal_places=2)
+    # comma-separated counts per VALUE_BUCKETS bucket
+    histogram = models.TextField(_("histogram"))
+    # the highest Donation id counted, for incremental refreshes
+    max_donation_id = models.IntegerField(_("max donation id"), db_index=True)
+
+    class Meta:
+        unique_together = ('actor', 'role', 'month', 'donation_type', 'nature_of_donation')
+        index_together = [('role', 'month')]
+
+
+def _donation_month(donation):
+    date = donation['accepted_date'] or donation['reported_date'] or donation['received_date']
+    return date.replace(day=1) if date else None
+
+
+def _build_rollups(donations):
+    groups = defaultdict(lambda: {'count': 0, 'total': Decimal(0), 'min': None, 'max': None,
+                                  'histogram': [0] * (len(VALUE_BUCKETS) + 1), 'max_id': 0})
+    for donation in donations:
+        value = donation['value'] or Decimal(0)
+        month = _donation_month(donation)
+        for role, actor_id in (('recipient', donation['recipient_id']), ('donor', donation['donor_id'])):
+            if role == 'donor' and actor_id is None:
+                continue
+            group = groups[(actor_id, role, month, donation['donation_type'], donation['nature_of_donation'])]
+            group['count'] += 1
+            group['total'] += value
+            group['min'] = value if group['min'] is None else min(group['min'], value)
+            group['max'] = value if group['max'] is None else max(group['max'], value)
+            group['histogram'][value_bucket(value)] += 1
+            group['max_id'] = max(group['max_id'], donation['id'])
+    return [DonationRollup(
+        actor_id=actor_id, role=role, month=month, donation_type=donation_type,
+        nature_of_donation=nature_of_donation, count=g['count'], total=g['total'],
+        min_value=g['min'], max_value=g['max'], histogram=','.join(str(x) for x in g['histogram']),
+        max_donation_id=g['max_id'],
+    ) for (actor_id, role, month, donation_type, nature_of_donation), g in groups.items()]
+
+
+DONATION_COLUMNS = ('id', 'donor_id', 'recipient_id', 'value', 'donation_type', 'nature_of_donation',
+                    'accepted_date', 'reported_date', 'received_date')
+
+
+def refresh_donation_rollups(actor_ids=None, full=False, batch_size=500):
+    """
+    Bring DonationRollup up to date. Donations are only ever added by
+    the importers, so by default this finds the donations added since
+    the last refresh (by id), and rebuilds the rollups of just the
+    actors they involve. With `actor_ids`, the rollups of those actors
+    are rebuilt (e.g. after their donations have been re-pointed); with
+    `full`, everything is.
+
+    Returns the number of donations added since the last refresh (or 0
+    with `actor_ids`).
+    """
+    num_new = 0
+    if actor_ids is not None:
+        affected = {'recipient': set(actor_ids), 'donor': set(actor_ids)}
+    else:
+        if full:
+            watermark = 0
+            DonationRollup.objects.all().delete()
+        else:
+            watermark = DonationRollup.objects.aggregate(m=Max('max_donation_id'))['m'] or 0
+
+        new = Donation.objects.filter(id__gt=watermark).values_list('recipient_id', 'donor_id')
+        affected = {'recipient': set(), 'donor': set()}
+        for recipient_id, donor_id in new.iterator():
+            num_new += 1
+            affected['recipient'].add(recipient_id)
+            if donor_id is not None:
+                affected['donor'].add(donor_id)
+
+    for role, actor_ids in affected.items():
+        fk = '{}_id'.format(role)
+        actor_ids = sorted(actor_ids, key=lambda x: (x is None, x))
+        for idx in range(0, len(actor_ids), batch_size):
+            batch = actor_ids[idx:idx + batch_size]
+            lookup = models.Q(**{'{}__in'.format(fk): [x for x in batch if x is not None]})
+            if None in batch:
+                lookup |= models.Q(**{'{}__isnull'.format(fk): True})
+            donations = Donation.objects.filter(lookup).values(*DONATION_COLUMNS)
+            rollups = [x for x in _build_rollups(donations.iterator()) if x.role == role]
+            rollup_lookup = models.Q(actor_id__in=[x for x in batch if x is not None])
+            if None in batch:
+                rollup_lookup |= models.Q(actor__isnull=True)
+            with transaction.atomic():
+                DonationRollup.objects.filter(rollup_lookup, role=role).delete()
+                DonationRollup.objects.bulk_create(rollups)
+    return num_new
+
+
+class ActorSummary(models.Model):
+    """
+    Counts of an actor's relationships, and the totals of the donations
+    they've made and received, so the actor page doesn't need to count
+    them. Actors with no relationships have no summary.
+
+    This is derived from Donation and Consultancy by
+    `refresh_actor_summaries`.
+    """
+    actor = models.OneToOneField(popolo_models.Actor, primary_key=True, related_name='relationship_summary')
+
+    donations_from_count = models.PositiveIntegerField(_("donations received"), default=0)
+    donations_from_total = models.DecimalField(_("total received"), max_digits=14, decimal_places=2, default=0)
+    donations_to_count = models.PositiveIntegerField(_("donations made"), default=0)
+    donations_to_total = models.DecimalField(_("total donated"), max_digits=14, decimal_places=2, default=0)
+    consulting_clients_count = models.PositiveIntegerField(_("consulting clients"), default=0)
+    consulting_agencies_count = models.PositiveIntegerField(_("consulting agencies"), default=0)
+
+    # when this was last refreshed, for incremental refreshes
+    refreshed_at = models.DateTimeField(_("refreshed at"), db_index=True)
+
+    def relationships(self):
+        return {
+            'donations_from': self.donations_from_count,
+            'donations_to': self.donations_to_count,
+            'consulting_clients': self.consulting_clients_count,
+            'consulting_agencies': self.consulting_agencies_count,
+        }
+
+
+class RelationshipToken(models.Model):
+    """
+    The normalised words (see `datafetch.names.name_tokens`) of the
+    names of an actor's counterparts in each of their relationships
+    (e.g. the donors of the donations they've received), for searching
+    within their relationship lists.
+
+    This is derived from Donation and Consultancy, along with
+    ActorSummary, by `refresh_actor_summaries`.
+    """
+    RELATIONSHIPS = Choices(
+        ('donations_from', _('Donations received')),
+        ('donations_to', _('Donations made')),
+        ('consulting_clients', _('Consulting clients')),
+        ('consulting_agencies', _('Consulting agencies')),
+    )
+
+    actor = models.ForeignKey(popolo_models.Actor, related_name='relationship_tokens')
+    relationship = models.CharField(_("relationship"), max_length=32, choices=RELATIONSHIPS)
+    token = models.CharField(_("token"), max_length=128)
+    counterpart = models.ForeignKey(popolo_models.Actor, related_name='+')
+
+    class Meta:
+        index_together = [('actor', 'relationship', 'token')]
+
+
+# (relationship / summary field prefix, model, actor foreign key,
+# counterpart foreign key)
+SUMMARY_COUNTS = (
+    ('donations_from', Donation, 'recipient', 'donor'),
+    ('donations_to', Donation, 'donor', 'recipient'),
+    ('consulting_clients', Consultancy, 'agency', 'client'),
+    ('consulting_agencies', Consultancy, 'client', 'agency'),
+)
+
+
+def _touched_actors(since):
+    actor_ids = set()
+    for relationship, model, fk, counterpart in SUMMARY_COUNTS:
+        queryset = model.objects.all()
+        if since is not None:
+            queryset = queryset.filter(updated_at__gte=since)
+        actor_ids.update(queryset.exclude(**{fk: None}).values_list('{}_id'.format(fk), flat=True).distinct())
+    if since is not None:
+        # the relationship tokens of anyone with a renamed counterpart
+        renamed = popolo_models.Actor.objects.filter(updated_at__gte=since).values('id')
+        actor_ids.update(RelationshipToken.objects.filter(
+            counterpart__in=renamed).values_list('actor_id', flat=True).distinct())
+    return actor_ids
+
+
+def _build_tokens(actor_ids):
+    tokens = []
+    for relationship, model, fk, counterpart in SUMMARY_COUNTS:
+        rows = model.objects.filter(**{'{}_id__in'.format(fk): actor_ids}).exclude(**{counterpart: None})
+        rows = rows.values_list('{}_id'.format(fk), '{}_id'.format(counterpart), '{}__name'.format(counterpart))
+        for actor_id, counterpart_id, name in rows.order_by().distinct():
+            tokens += [RelationshipToken(actor_id=actor_id, relationship=relationship, token=token[:128],
+                                         counterpart_id=counterpart_id)
+                       for token in indexed_tokens(name)]
+    return tokens
+
+
+def filter_by_counterpart(queryset, actor_id, relationship, counterpart, search, descendants=False):
+    """
+    Filter `queryset` (one of `actor_id`'s relationships, or with
+    `descendants`, those of the organizations under them too) to the
+    rows whose `counterpart` has a word starting with each word of
+    `search` in their name. Spelling variants that `name_tokens`
+    normalises ("Limited" and "Ltd", "The X" and "X, The") match.
+    """
+    tokens = name_tokens(search)
+    actors = subtree_q('actor_id', actor_id) if descendants else models.Q(actor_id=actor_id)
+    candidates = RelationshipToken.objects.filter(actors, relationship=relationship)
+    for token in tokens:
+        matching = candidates.filter(token__startswith=token).values('counterpart_id')
+        queryset = queryset.filter(**{'{}__in'.format(counterpart): matching})
+    return queryset
+
+
+def refresh_actor_summaries(actor_ids=None, full=False, batch_size=500):
+    """
+    Recompute the summaries and relationship tokens of `actor_ids`. By
+    default, that's every actor with a donation or consultancy that's
+    been added or changed (or a counterpart that's been renamed) since
+    the last refresh; with `full`, it's everyone.
+
+    Returns the number of actors refreshed.
+    """
+    started = timezone.now()
+    if actor_ids is None:
+        since = None
+        if not full:
+            since = ActorSummary.objects.aggregate(m=Max('refreshed_at'))['m']
+        actor_ids = _touched_actors(since)
+        if full:
+            # (the actors with no relationships left, a batch at a time)
+            for model in (ActorSummary, RelationshipToken):
+                stale = sorted(set(model.objects.values_list('actor_id', flat=True).distinct()) - set(actor_ids))
+                for idx in range(0, len(stale), batch_size):
+                    model.objects.filter(actor_id__in=stale[idx:idx + batch_size]).delete()
+    actor_ids = sorted(actor_ids)
+
+    for idx in range(0, len(actor_ids), batch_size):
+        batch = actor_ids[idx:idx + batch_size]
+        summaries = {}
+        for prefix, model, fk, counterpart in SUMMARY_COUNTS:
+            fk_id = '{}_id'.format(fk)
+            rows = model.objects.filter(**{'{}__in'.format(fk_id): batch}).values(fk_id).order_by()
+            if model is Donation:
+                rows = rows.annotate(count=Count('id'), total=Sum('value'))
+            else:
+                rows = rows.annotate(count=Count('id'))
+            for row in rows:
+                summary = summaries.get(row[fk_id])
+                if summary is None:
+                    summary = summaries[row[fk_id]] = ActorSummary(actor_id=row[fk_id], refreshed_at=started)
+                setattr(summary, '{}_count'.format(prefix), row['count'])
+                if 'total' in row:
+                    setattr(summary, '{}_total'.format(prefix), row['total'] or 0)
+        tokens = _build_tokens(batch)
+        with transaction.atomic():
+            ActorSummary.objects.filter(actor_id__in=batch).delete()
+            ActorSummary.objects.bulk_create(summaries.values())
+            RelationshipToken.objects.filter(actor_id__in=batch).delete()
+            RelationshipToken.objects.bulk_create(tokens)
+    return len(actor_ids)
@@ -0,0 +1,63 @@
+"""
+Normalising actors' names for matching.
+"""
+import re
+import unicodedata
+
+
+# multi-word forms, replaced before a name is split into words
+_PHRASES = [
+    (re.compile(r'\bpublic limited company\b'), 'plc'),
+    (re.compile(r'\blimited liability partnership\b'), 'llp'),
+    (re.compile(r'&'), ' and '),
+    # O'Brien -> obrien
+    (re.compile(r"['’]"), ''),
+]
+
+# word -> its canonical form
+_SYNONYMS = {
+    'limited': 'ltd',
+    'company': 'co',
+    'corporation': 'corp',
+    'incorporated': 'inc',
+    'saint': 'st',
+}
+
+# words that are ignored ("The X" and "X, The" are the same)
+_STOPWORDS = {'the'}
+
+_word_re = re.compile(r'\w+', re.UNICODE)
+
+
+def fold(text):
+    """
+    Lowercase `text` and strip its accents.
+    """
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def name_tokens(name):
+    """
+    The normalised words of `name`, in order: folded, with corporate
+    suffixes and the like in one canonical form ("Limited" -> "ltd",
+    "&" -> "and") and articles dropped.
+    """
+    return [_SYNONYMS.get(word, word) for word in _words(name)]
+
+
+def indexed_tokens(name):
+    """
+    The tokens to index `name` under, so that it's found by searches
+    for the start of any of its normalised words (or of the words as
+    written, e.g. "Lim" finds "Limited").
+    """
+    words = _words(name)
+    return set(words) | set(_SYNONYMS.get(word, word) for word in words)
+
+
+def _words(name):
+    name = fold(name)
+    for pattern, replacement in _PHRASES:
+        name = pattern.sub(replacement, name)
+    return [word for word in _word_re.findall(name) if word not in _STOPWORDS]
@@ -0,0 +1,37 @@
+"""
+Receivers for `datafetch.signals.import_finished`, keeping the tables
+derived from the imported data up to date. They're connected in
+`DataFetchConfig.ready`.
+"""
+from datafetch import models
+from datafetch.search import update_search_index
+
+
+def refresh_rollups(sender, **kwargs):
+    print("Refreshing donation rollups ...")
+    models.refresh_donation_rollups()
+
+
+def refresh_summaries(sender, **kwargs):
+    print("Refreshing actor summaries ...")
+    models.refresh_actor_summaries()
+
+
+def update_search(sender, **kwargs):
+    print("Updating the search index ...")
+    update_search_index()
+
+
+def refresh_rankings(sender, **kwargs):
+    print("Refreshing actor rankings ...")
+    models.refresh_actor_rankings()
+
+
+def refresh_similarities(sender, **kwargs):
+    print("Refreshing actor similarities ...")
+    models.refresh_actor_similarities()
+
+
+def refresh_hierarchies(sender, **kwargs):
+    print("Refreshing the organization and area hierarchies ...")
+    models.refresh_closures()
@@ -0,0 +1,115 @@
+"""
+Full-text search over actors' names and other names, through haystack
+(by default with a local Whoosh index; see HAYSTACK_CONNECTIONS).
+
+Names are folded (accents stripped, lowercased) both when they're
+indexed and when they're searched for, so "Gonzalez" finds "González".
+The index is brought up to date after every import, for just the
+actors that have changed.
+"""
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from haystack import connections
+from haystack.inputs import AutoQuery
+from haystack.query import SearchQuerySet
+
+from datafetch import models
+from datafetch.names import fold
+
+
+BATCH_SIZE = 1000
+
+
+def get_other_names(actor_ids=None):
+    """
+    Return {actor id: [(other name id, name), ...]} for `actor_ids`
+    (or every actor), in one query. (Other names point at the concrete
+    Person or Organization, so they can't be fetched through
+    Actor.other_names.)
+    """
+    content_types = ContentType.objects.get_for_models(models.Actor, models.Person, models.Organization)
+    other_names = defaultdict(list)
+    rows = models.OtherName.objects.filter(content_type__in=content_types.values())
+    if actor_ids is not None:
+        rows = rows.filter(object_id__in=actor_ids)
+    rows = rows.values_list('object_id', 'id', 'name')
+    for actor_id, pk, name in rows:
+        other_names[actor_id].append((pk, name))
+    return other_names
+
+
+def search_actors(query, limit=10):
+    """
+    Return (number of matches, the top `limit` actors), best first.
+    """
+    query = fold(query).strip()
+    if not query:
+        return 0, []
+    sqs = SearchQuerySet().models(models.Actor).filter(content=AutoQuery(query))
+    count = sqs.count()
+    ids = [int(result.pk) for result in sqs[:limit]]
+    actors = models.Actor.objects.non_polymorphic().in_bulk(ids)
+    return count, [actors[pk] for pk in ids if pk in actors]
+
+
+def _watermark(field):
+    results = SearchQuerySet().models(models.Actor).order_by('-{}'.format(field))[:1]
+    return getattr(results[0], field) if results else None
+
+
+def update_search_index(full=False, batch_size=BATCH_SIZE):
+    """
+    (Re)index the actors that have been added or changed, or given an
+    other name, since the last update; with `full`, clear the index and
+    index everyone.
+
+    Returns the number of actors indexed.
+    """
+    backend = connections['default'].get_backend()
+    index = connections['default'].get_unified_index().get_index(models.Actor)
+    queryset = models.Actor.objects.non_polymorphic()
+
+    if full:
+        backend.clear(models=[models.Actor])
+        actor_ids = list(queryset.values_list('id', flat=True))
+    else:
+        updated_at, other_name_id = _watermark('updated_at'), _watermark('max_other_name_id')
+        actors = queryset
+        if updated_at is not None:
+            actors = actors.filter(updated_at__gte=updated_at)
+        actor_ids = set(actors.values_list('id', flat=True))
+        other_names = models.OtherName.objects.filter(id__gt=other_name_id or 0)
+        actor_ids.update(other_names.values_list('object_id', flat=True).distinct())
+    actor_ids = sorted(x for x in actor_ids if x is not None)
+
+    for idx in range(0, len(actor_ids), batch_size):
+        batch = actor_ids[idx:idx + batch_size]
+        other_names = get_other_names(batch)
+        actors = list(queryset.filter(id__in=batch))
+        for actor in actors:
+            actor._other_names = other_names.get(actor.id, [])
+        backend.update(index, actors)
+    return len(actor_ids)
+
+
+def remove_from_search_index(actor_ids):
+    backend = connections['default'].get_backend()
+    identifiers = ['datafetch.actor.{}'.format(actor_id) for actor_id in actor_ids]
+    if backend.__class__.__name__ == 'WhooshSearchBackend':
+        # Whoosh commits every remove() separately, which takes a
+        # while for more than a few actors, so delete them all at once
+        from haystack.constants import ID
+        if not backend.setup_complete:
+            backend.setup()
+        backend.index = backend.index.refresh()
+        writer = backend.index.writer()
+        with writer.searcher() as searcher:
+            for identifier in identifiers:
+                docnum = searcher.document_number(**{ID: identifier})
+                if docnum is not None:
+                    writer.delete_document(docnum)
+        writer.commit()
+    else:
+        for identifier in identifiers:
+            backend.remove(identifier)
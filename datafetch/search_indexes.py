@@ -0,0 +1,42 @@
+from haystack import indexes
+
+from datafetch import models
+from datafetch.names import fold
+from datafetch.search import get_other_names
+
+
+class ActorIndex(indexes.SearchIndex, indexes.Indexable):
+    """
+    Actors, searchable by (folded) name and other names. See
+    `datafetch.search.update_search_index`.
+    """
+    text = indexes.CharField(document=True)
+    kind = indexes.CharField(model_attr='kind')
+    # for incremental updates
+    updated_at = indexes.DateTimeField(model_attr='updated_at')
+    max_other_name_id = indexes.IntegerField()
+
+    def get_model(self):
+        return models.Actor
+
+    def index_queryset(self, using=None):
+        return self.get_model().objects.non_polymorphic()
+
+    def get_updated_field(self):
+        return 'updated_at'
+
+    def _other_names(self, obj):
+        # update_search_index fetches these for a batch of actors at a
+        # time; update_index and rebuild_index don't
+        if not hasattr(obj, '_other_names'):
+            obj._other_names = get_other_names([obj.id]).get(obj.id, [])
+        return obj._other_names
+
+    def prepare_text(self, obj):
+        # the name is repeated so that matches on it rank higher
+        # than matches on an other name
+        names = [obj.name, obj.name] + [name for _, name in self._other_names(obj)]
+        return fold(' '.join(names))
+
+    def prepare_max_other_name_id(self, obj):
+        return max([pk for pk, _ in self._other_names(obj)] or [0])
@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+
+# Sent (by `helpers.finish_import`) when an import command has
+# finished and its changes are committed, but before the data version
+# is bumped. `sender` is the command class.
+import_finished = Signal(providing_args=['command'])
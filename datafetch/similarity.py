@@ -0,0 +1,175 @@
+"""
+Top-k Jaccard similarity between the rows of a sparse binary incidence
+matrix (e.g. recipients by donors), without comparing every pair of
+rows.
+
+Each row is only compared with candidates found by two kinds of
+blocking:
+
+ * the rows it shares the most columns with, among columns that aren't
+   too common (e.g. recipients with donors in common, not counting
+   donors who gave to hundreds of recipients), from a sparse product;
+ * rows whose MinHash signatures agree with its own on a whole band
+   (locality sensitive hashing), which finds rows that are very
+   similar even if they only share common columns (e.g. donors who
+   only ever gave to the same big party).
+
+The candidates' similarities are then computed exactly. Rows are
+processed a chunk at a time, so memory use doesn't depend on how many
+pairs of rows share a column.
+"""
+import numpy as np
+from scipy import sparse
+
+
+NUM_HASHES = 32
+BAND_ROWS = 4
+
+# columns in more rows than this aren't used for blocking
+MAX_BLOCK_SIZE = 500
+
+# the most candidates taken from shared columns, per row
+MAX_BLOCK_CANDIDATES = 200
+
+# rows are paired with at most this many rows either side of them (in
+# id order) in their LSH bucket, so that a bucket of thousands of
+# identical rows doesn't produce millions of pairs
+BUCKET_WINDOW = 10
+
+TOP_K = 20
+
+CHUNK_SIZE = 2000
+
+# the most matrix entries compared at once when counting shared columns
+MAX_ENTRIES = 5000000
+
+# (a Mersenne prime, for the MinHash hash functions)
+_PRIME = (1 << 31) - 1
+
+
+def minhash_signatures(incidence, num_hashes=NUM_HASHES, seed=0):
+    """
+    An (rows, num_hashes) array of the MinHash signatures of the rows
+    of the CSR matrix `incidence`. Empty rows get _PRIME throughout.
+    """
+    random = np.random.RandomState(seed)
+    a = random.randint(1, _PRIME, size=num_hashes, dtype=np.int64)
+    b = random.randint(0, _PRIME, size=num_hashes, dtype=np.int64)
+    columns = incidence.indices.astype(np.int64)
+    signatures = np.full((incidence.shape[0], num_hashes), _PRIME, dtype=np.int32)
+    nonempty = np.diff(incidence.indptr) > 0
+    if not len(columns):
+        return signatures
+    starts = incidence.indptr[:-1][nonempty]
+    for idx in range(num_hashes):
+        hashes = (a[idx] * columns + b[idx]) % _PRIME
+        signatures[nonempty, idx] = np.minimum.reduceat(hashes, starts)
+    return signatures
+
+
+def lsh_bands(incidence, num_hashes=NUM_HASHES, band_rows=BAND_ROWS):
+    """
+    For each band of the rows' MinHash signatures, (the bucket of each
+    row (-1 for empty rows), the rows in bucket and id order, and each
+    row's position in that order).
+    """
+    signatures = minhash_signatures(incidence, num_hashes)
+    empty = np.diff(incidence.indptr) == 0
+    ids = np.arange(incidence.shape[0])
+    bands = []
+    for start in range(0, num_hashes, band_rows):
+        band = np.ascontiguousarray(signatures[:, start:start + band_rows])
+        keys = band.view(np.dtype((np.void, band.dtype.itemsize * band.shape[1]))).ravel()
+        buckets = np.unique(keys, return_inverse=True)[1].ravel().astype(np.int64)
+        buckets[empty] = -1
+        order = np.lexsort((ids, buckets))
+        position = np.empty_like(order)
+        position[order] = ids
+        bands.append((buckets, order, position))
+    return bands
+
+
+def _lsh_candidates(bands, rows, window):
+    candidates = ([], [])
+    for buckets, order, position in bands:
+        for offset in range(-window, window + 1):
+            if not offset:
+                continue
+            positions = position[rows] + offset
+            valid = (positions >= 0) & (positions < len(order))
+            others = order[np.clip(positions, 0, len(order) - 1)]
+            same = valid & (buckets[rows] >= 0) & (buckets[others] == buckets[rows])
+            candidates[0].append(rows[same])
+            candidates[1].append(others[same])
+    return candidates
+
+
+def _block_candidates(blocking, rows, max_candidates):
+    shared = blocking[rows].dot(blocking.T).tocoo()
+    chunk_rows, others, counts = rows[shared.row], shared.col, shared.data
+    keep = chunk_rows != others
+    chunk_rows, others, counts = chunk_rows[keep], others[keep], counts[keep]
+    # the rows sharing the most columns with each row
+    order = np.lexsort((others, -counts, chunk_rows))
+    chunk_rows, others = chunk_rows[order], others[order]
+    rank = np.arange(len(chunk_rows)) - np.searchsorted(chunk_rows, chunk_rows)
+    keep = rank < max_candidates
+    return [chunk_rows[keep]], [others[keep]]
+
+
+def _shared(incidence, sizes, rows, others, max_entries=MAX_ENTRIES):
+    """
+    The number of columns each pair of `rows` and `others` share,
+    comparing batches of pairs with at most about `max_entries`
+    entries between them.
+    """
+    shared = np.zeros(len(rows), dtype=np.int64)
+    ends = np.cumsum(sizes[rows] + sizes[others])
+    start = 0
+    while start < len(rows):
+        done = ends[start - 1] if start else 0
+        end = max(np.searchsorted(ends, done + max_entries, side='right'), start + 1)
+        shared[start:end] = np.asarray(
+            incidence[rows[start:end]].multiply(incidence[others[start:end]]).sum(axis=1)).ravel()
+        start = end
+    return shared
+
+
+def _top_k(incidence, sizes, rows, others, top_k):
+    pairs = np.unique(rows * incidence.shape[0] + others)
+    rows, others = pairs // incidence.shape[0], pairs % incidence.shape[0]
+    shared = _shared(incidence, sizes, rows, others)
+    union = sizes[rows] + sizes[others] - shared
+    scores = shared / np.maximum(union, 1)
+    keep = shared > 0
+    rows, others, scores, shared = rows[keep], others[keep], scores[keep], shared[keep]
+    # best first (ties by the other row), then the first top_k of each row
+    order = np.lexsort((others, -scores, rows))
+    rows, others, scores, shared = rows[order], others[order], scores[order], shared[order]
+    keep = np.arange(len(rows)) - np.searchsorted(rows, rows) < top_k
+    return rows[keep], others[keep], scores[keep], shared[keep].astype(np.int64)
+
+
+def top_similar(incidence, rows=None, top_k=TOP_K, max_block_size=MAX_BLOCK_SIZE,
+                max_block_candidates=MAX_BLOCK_CANDIDATES, window=BUCKET_WINDOW, chunk_size=CHUNK_SIZE):
+    """
+    Yield arrays (row, similar row, Jaccard similarity, number of
+    shared columns) for the `top_k` most similar rows to each row of
+    `incidence` (or each of `rows`) among its candidates, best first,
+    a chunk of rows at a time.
+    """
+    incidence = sparse.csr_matrix(incidence, dtype=np.float64)
+    incidence.data[:] = 1
+    sizes = incidence.getnnz(axis=1)
+    column_sizes = incidence.getnnz(axis=0)
+    blocking = incidence[:, np.flatnonzero((column_sizes > 1) & (column_sizes <= max_block_size))].tocsr()
+    bands = lsh_bands(incidence)
+    if rows is None:
+        rows = np.flatnonzero(sizes)
+    rows = np.asarray(rows, dtype=np.int64)
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        candidate_rows, candidate_others = _block_candidates(blocking, chunk, max_block_candidates)
+        lsh_rows, lsh_others = _lsh_candidates(bands, chunk, window)
+        yield _top_k(incidence, sizes, np.concatenate(candidate_rows + lsh_rows),
+                     np.concatenate(candidate_others + lsh_others), top_k)
@@ -19,7 +19,25 @@ $(function() {
         return '<a href="' + value + '" target="_blank">Source</a>';
     };
 
+    // The first page of every table comes from one request for the
+    // actor's bundle; after that, each table asks for its own pages.
+    var bundleUrl = $('#relationships').data('bundle-url');
+    var bundle = bundleUrl && $('#relationships table').length ? $.getJSON(bundleUrl) : null;
+    var isFirstPage = function(tbl, params) {
+        return params.cursor === '' && !params.search &&
+            params.sort === $(tbl).data('sort-name') && params.order === $(tbl).data('sort-order');
+    };
+
     $('table').each(function(idx, tbl) {
+        // Stepping to the next or previous page uses the cursors from
+        // the last response, which stay fast however deep the list goes.
+        // Jumping to an arbitrary page falls back to an offset.
+        var pages = {};
+        var pending;
+        var sameQuery = function(a, b) {
+            return a.sort === b.sort && a.order === b.order && a.search === b.search && a.limit === b.limit;
+        };
+
         $(tbl).bootstrapTable({
             dataField: 'results',
             sidePagination: 'server',
@@ -28,7 +46,43 @@ $(function() {
             onLoadSuccess: function() {
                 externalLinks(tbl);
             },
+            ajax: function(request) {
+                var key = $(tbl).data('bundle-key');
+                if (!bundle || !key || !isFirstPage(tbl, request.data)) {
+                    return $.ajax(request);
+                }
+                bundle.done(function(res) {
+                    var page = res.relationships[key];
+                    if (page && res.limit === request.data.limit) {
+                        request.success(page);
+                    } else {
+                        $.ajax(request);
+                    }
+                }).fail(function() {
+                    $.ajax(request);
+                });
+            },
+            queryParams: function(params) {
+                pending = $.extend({}, params);
+                if (params.offset === 0) {
+                    params.cursor = '';
+                } else if (sameQuery(params, pages)) {
+                    if (pages.next && params.offset === pages.offset + params.limit) {
+                        params.cursor = pages.next;
+                    } else if (pages.previous && params.offset === pages.offset - params.limit) {
+                        params.cursor = pages.previous;
+                    }
+                }
+                if (params.cursor !== undefined) {
+                    delete params.offset;
+                }
+                return params;
+            },
             responseHandler: function(res) {
+                pages = $.extend(pending, {
+                    next: res.next_cursor,
+                    previous: res.previous_cursor
+                });
                 res.total = res.count;
                 return res;
             }
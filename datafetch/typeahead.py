@@ -0,0 +1,216 @@
+"""
+An in-process trigram index over actors' names and other names, for
+autocompleting actor names as they're typed.
+
+Names are folded (see `datafetch.names.fold`) and split into words,
+and each word into trigrams as pg_trgm does ("  w", " wo", "wor", ...).
+Names with a word starting with the query are matched first, ranked
+by the actor's number of relationships. Other names are then matched
+by the share of the query's trigrams they contain, so that typos and
+missing words still find something.
+
+The index is built on first use, and rebuilt when the data version
+changes (i.e. after an import), or when an actor or other name is
+saved or deleted in this process.
+"""
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+import heapq
+import re
+import threading
+
+from datafetch.dataversion import get_data_version
+from datafetch.names import fold
+
+
+# the least share of the query's trigrams a name must contain
+MIN_COVERAGE = 0.5
+
+# the most matches returned for a query
+MAX_RESULTS = 50
+
+# prefixes matching more names than this have their best matches
+# kept, rather than ranking the names on every request
+PREFIX_SCAN_LIMIT = 1000
+
+_word_re = re.compile(r'\w+', re.UNICODE)
+
+Match = namedtuple('Match', ('actor_id', 'name', 'kind', 'slug', 'matched', 'relationships'))
+
+
+def trigrams(text, partial=False):
+    """
+    The set of trigrams in the words of (folded) `text`. With `partial`,
+    the last word is taken to be incomplete, so isn't padded at the end.
+    """
+    words = _word_re.findall(text)
+    result = set()
+    for idx, word in enumerate(words):
+        padded = '  ' + word
+        if not (partial and idx == len(words) - 1):
+            padded += ' '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class TypeaheadIndex(object):
+    def __init__(self, actors, other_names, relationships):
+        """
+        `actors` is an iterable of (id, name, kind, slug), `other_names`
+        of (actor id, name), and `relationships` a dict of every actor's
+        id -> {relationship: count} (see ActorSummary.relationships).
+        """
+        self.actors = {}
+        # one entry per name (including other names)
+        self.entry_actor = array('l')
+        self.entry_name = []
+        self.entry_folded = []
+        self.entry_size = array('l')
+        # the actor's number of relationships
+        self.entry_popularity = array('l')
+        self.postings = defaultdict(lambda: array('l'))
+
+        def add(actor_id, name):
+            entry = len(self.entry_name)
+            folded = fold(name)
+            grams = trigrams(folded)
+            self.entry_actor.append(actor_id)
+            self.entry_name.append(name)
+            self.entry_folded.append(folded)
+            self.entry_popularity.append(sum(self.actors[actor_id][3].values()))
+            self.entry_size.append(len(grams))
+            for gram in grams:
+                self.postings[gram].append(entry)
+
+        for actor_id, name, kind, slug in actors:
+            self.actors[actor_id] = (name, kind, slug, relationships[actor_id])
+            add(actor_id, name)
+        for actor_id, name in other_names:
+            if actor_id in self.actors:
+                add(actor_id, name)
+        self.postings = dict(self.postings)
+
+        # (folded name from the start of each word, entry), sorted,
+        # for prefix matches
+        self.prefixes = sorted(
+            (folded[match.start():], entry)
+            for entry, folded in enumerate(self.entry_folded)
+            for match in _word_re.finditer(folded))
+        self._prefix_keys = [x[0] for x in self.prefixes]
+        self._top_by_prefix = {}
+
+    @classmethod
+    def build(cls):
+        from datafetch import models
+        from datafetch.search import get_other_names
+        actors = list(models.Actor.objects.non_polymorphic().values_list('id', 'name', 'kind', 'slug'))
+        other_names = get_other_names()
+        # (actors with no relationships have no summary)
+        no_relationships = models.ActorSummary().relationships()
+        relationships = {x[0]: no_relationships for x in actors}
+        relationships.update((x.actor_id, x.relationships()) for x in models.ActorSummary.objects.all())
+        return cls(
+            actors,
+            ((actor_id, name) for actor_id, names in other_names.items() for _, name in names),
+            relationships,
+        )
+
+    def _rank(self, entry):
+        return self.entry_popularity[entry], -self.entry_actor[entry]
+
+    def _best_entries(self, entries, limit):
+        """
+        The best entry for each of the first `limit` actors among the
+        (ranked) `entries`.
+        """
+        best = OrderedDict()
+        for entry in entries:
+            best.setdefault(self.entry_actor[entry], entry)
+            if len(best) == limit:
+                break
+        return list(best.values())
+
+    def _prefix_matches(self, query, limit):
+        """
+        The names with a word starting with `query`: those that start
+        with it first, then by the actor's number of relationships.
+        """
+        start = bisect_left(self._prefix_keys, query)
+        end = bisect_left(self._prefix_keys, query + '\uffff', start)
+        if end - start > PREFIX_SCAN_LIMIT:
+            # short or common prefixes match a lot of names, so their
+            # best MAX_RESULTS are worked out once and kept
+            top = self._top_by_prefix.get(query)
+            if top is None:
+                top = self._top_by_prefix[query] = self._rank_prefix_range(query, start, end, MAX_RESULTS)
+            return top[:limit]
+        return self._rank_prefix_range(query, start, end, limit)
+
+    def _rank_prefix_range(self, query, start, end, limit):
+        entries = set(self.prefixes[idx][1] for idx in range(start, end))
+        ranked = sorted(entries, key=lambda entry: (self.entry_folded[entry].startswith(query),) + self._rank(entry),
+                        reverse=True)
+        return self._best_entries(ranked, limit)
+
+    def _trigram_matches(self, query, limit):
+        """
+        The names containing at least MIN_COVERAGE of the query's
+        trigrams, best first.
+        """
+        grams = trigrams(query, partial=True)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        need = MIN_COVERAGE * len(grams)
+        # by the share of the query's trigrams they contain, then
+        # by how few other trigrams they have
+        scored = [(count, -self.entry_size[entry]) + self._rank(entry) + (entry,)
+                  for entry, count in shared.items() if count >= need]
+        ranked = (x[-1] for x in heapq.nlargest(limit * 4, scored))
+        return self._best_entries(ranked, limit)
+
+    def complete(self, query, limit=10):
+        """
+        Return the best `limit` (at most MAX_RESULTS) Matches for
+        `query`, best first. Each actor appears once, under the best
+        match of any of their names. Names with a word starting with
+        the query come first, then (for queries of three or more
+        characters) near matches.
+        """
+        query = ' '.join(_word_re.findall(fold(query)))
+        limit = min(limit, MAX_RESULTS)
+        if not query:
+            return []
+        entries = self._prefix_matches(query, limit)
+        if len(entries) < limit and len(query) >= 3:
+            seen = set(self.entry_actor[entry] for entry in entries)
+            entries += [x for x in self._trigram_matches(query, limit) if self.entry_actor[x] not in seen]
+
+        result = []
+        for entry in entries[:limit]:
+            actor_id = self.entry_actor[entry]
+            name, kind, slug, counts = self.actors[actor_id]
+            matched = self.entry_name[entry]
+            result.append(Match(actor_id, name, kind, slug, None if matched == name else matched, counts))
+        return result
+
+
+# (data version, index)
+_index = (None, None)
+_lock = threading.Lock()
+
+
+def get_typeahead_index():
+    global _index
+    version, _ = get_data_version()
+    with _lock:
+        if _index[1] is None or _index[0] != version:
+            _index = (version, TypeaheadIndex.build())
+        return _index[1]
+
+
+def clear_typeahead_index(sender=None, **kwargs):
+    global _index
+    with _lock:
+        _index = (None, None)
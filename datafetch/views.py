@@ -1,10 +1,10 @@
 from django.views.generic import TemplateView
 from django.views.generic.base import RedirectView
 from django.shortcuts import get_object_or_404
-from django.template.defaultfilters import slugify
-from django.db.models import Q
 
 from datafetch import models
+from datafetch.dataversion import DataVersionConditionMixin
+from datafetch.search import search_actors
 
 
 class ActorRedirectView(RedirectView):
@@ -13,13 +13,12 @@ class ActorRedirectView(RedirectView):
     query_string = True
 
     def get_redirect_url(self, *args, **kwargs):
-        actor = get_object_or_404(models.Actor, pk=kwargs['pk'])
-        self.pattern_name = actor.url_name
-        kwargs['slug'] = slugify(actor.name)
+        actor = get_object_or_404(models.Actor.objects.non_polymorphic(), pk=kwargs['pk'])
+        self.url = models.actor_url(actor.kind, actor.id, actor.slug, absolute=False)
         return super(ActorRedirectView, self).get_redirect_url(*args, **kwargs)
 
 
-class SearchView(TemplateView):
+class SearchView(DataVersionConditionMixin, TemplateView):
     template_name = 'search.html'
 
     def get_context_data(self, *args, **kwargs):
@@ -28,18 +27,14 @@ class SearchView(TemplateView):
         query = self.request.GET.get('q', '')
 
         context["query"] = query
-        qset = models.Actor.objects.filter(
-            Q(name__icontains=query) |
-            Q(Organization___other_names__name__icontains=query) |
-            Q(Person___other_names__name__icontains=query)
-        ).distinct('id')
-        context["num_results"] = format(qset.count(), ",d")
-        context["results"] = qset[:10]
+        num_results, results = search_actors(query, limit=10)
+        context["num_results"] = format(num_results, ",d")
+        context["results"] = results
 
         return context
 
 
-class ActorView(TemplateView):
+class ActorView(DataVersionConditionMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super(ActorView, self).get_context_data(**kwargs)
 
@@ -51,11 +46,12 @@ class ActorView(TemplateView):
 
         context['memberships'] = actor.memberships.order_by('-end_date', '-start_date')[:10]
 
-        context['relationships'] = {
-            'donations_from': actor.received_donations_from.count(),
-            'donations_to': actor.donated_to.count(),
-            'consulting_clients': actor.consulting_clients.count(),
-            'consulting_agencies': actor.consulting_agencies.count(),
-        }
+        # the relationship counts (and donation totals) are kept
+        # up to date by the importers, in ActorSummary
+        summary = models.ActorSummary.objects.filter(actor_id=actor.id).first()
+        if summary is None:
+            summary = models.ActorSummary(actor_id=actor.id)
+        context['relationship_summary'] = summary
+        context['relationships'] = summary.relationships()
 
         return context
@@ -0,0 +1,202 @@
+"""
+Per-request instrumentation. `InstrumentationMiddleware` records, for
+every request:
+
+ * queries - SQL queries issued
+ * db_time - seconds spent in those queries
+ * serialization_time - seconds spent serializing and rendering
+   the response
+ * total_time - seconds spent handling the request
+ * response_size - bytes in the response body
+
+These are aggregated per endpoint (URL name) in-process, and requests
+that go over one of the REQUEST_BUDGETS in settings are logged.
+
+Counting queries needs every query's SQL and timing to be kept, so
+queries and db_time are only recorded when DEBUG or
+INSTRUMENT_QUERIES is on.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import JsonResponse
+from django.test.utils import CaptureQueriesContext
+
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('queries', 'db_time', 'serialization_time', 'total_time', 'response_size')
+
+# endpoint -> {'requests': n, 'over_budget': n, metric: {'total': x, 'max': x}}
+_metrics = {}
+_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _stats(request):
+    # DRF wraps the Django request
+    request = getattr(request, '_request', request)
+    return getattr(request, '_instrumentation', None)
+
+
+@contextmanager
+def timer(request, metric):
+    """
+    Add the time spent inside the block to `metric` for this request
+    (if it's being instrumented).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _stats(request)
+        if stats is not None:
+            stats[metric] = stats.get(metric, 0) + time.perf_counter() - start
+
+
+def get_budget(endpoint):
+    budgets = settings.REQUEST_BUDGETS
+    budget = dict(budgets.get('default', {}))
+    budget.update(budgets.get(endpoint, {}))
+    return budget
+
+
+def _record(endpoint, stats):
+    over = [(metric, stats[metric], limit) for metric, limit in get_budget(endpoint).items()
+            if stats.get(metric) is not None and stats[metric] > limit]
+    with _lock:
+        m = _metrics.setdefault(endpoint, {'requests': 0, 'over_budget': 0})
+        m['requests'] += 1
+        if over:
+            m['over_budget'] += 1
+        for metric in METRICS:
+            # (the size of streamed responses isn't known)
+            value = stats.get(metric) or 0
+            agg = m.setdefault(metric, {'total': 0, 'max': 0})
+            agg['total'] += value
+            agg['max'] = max(agg['max'], value)
+    return over
+
+
+def get_metrics():
+    """
+    Aggregated metrics for each endpoint since this process started.
+    """
+    with _lock:
+        result = OrderedDict()
+        for endpoint in sorted(_metrics):
+            m = _metrics[endpoint]
+            result[endpoint] = OrderedDict([
+                ('requests', m['requests']),
+                ('over_budget', m['over_budget']),
+            ])
+            for metric in METRICS:
+                result[endpoint][metric] = OrderedDict([
+                    ('mean', m[metric]['total'] / m['requests']),
+                    ('max', m[metric]['max']),
+                ])
+        return result
+
+
+def reset_metrics():
+    with _lock:
+        _metrics.clear()
+
+
+@staff_member_required
+def metrics_view(request):
+    return JsonResponse(get_metrics())
+
+
+class InstrumentationMiddleware(object):
+    """
+    This should come first in MIDDLEWARE_CLASSES, so that it sees
+    (nearly) the whole request and the final response.
+    """
+    def process_request(self, request):
+        connection = connections['default']
+        queries_before = None
+        if settings.INSTRUMENT_QUERIES:
+            # log queries (with timings) even when DEBUG is off. The log
+            # is emptied at the start of every request.
+            connection.force_debug_cursor = True
+            queries_before = len(connection.queries_log)
+        request._instrumentation = {
+            'start': time.perf_counter(),
+            'queries_before': queries_before,
+        }
+
+    def process_template_response(self, request, response):
+        # the response (template or DRF Response) is
+        # rendered straight after this
+        start = time.perf_counter()
+
+        def rendered(response):
+            stats = _stats(request)
+            if stats is not None:
+                stats['serialization_time'] = stats.get('serialization_time', 0) + time.perf_counter() - start
+        response.add_post_render_callback(rendered)
+        return response
+
+    def process_response(self, request, response):
+        stats = _stats(request)
+        if stats is None:
+            return response
+        if stats['queries_before'] is not None:
+            queries = list(connections['default'].queries_log)[stats['queries_before']:]
+            stats['queries'] = len(queries)
+            stats['db_time'] = sum(float(q['time']) for q in queries)
+        stats['total_time'] = time.perf_counter() - stats['start']
+        if response.streaming:
+            stats['response_size'] = None
+        else:
+            stats['response_size'] = len(response.content)
+
+        match = request.resolver_match
+        endpoint = (match.url_name or match.view_name) if match else '<unresolved>'
+        over = _record(endpoint, stats)
+        if over:
+            logger.warning('%s %s over budget: %s', request.method, request.get_full_path(), ', '.join(
+                '{} {:.4g} > {}'.format(metric, value, limit) for metric, value, limit in over))
+        return response
+
+
+@contextmanager
+def max_queries(limit, using='default'):
+    """
+    Like `assertNumQueries`, but only fails if more than `limit`
+    queries are issued. For example:
+
+        with max_queries(3):
+            client.get('/api/actors/1/donations-from')
+    """
+    with CaptureQueriesContext(connections[using]) as ctx:
+        yield ctx
+    if len(ctx.captured_queries) > limit:
+        raise QueryBudgetExceeded('{} queries executed, {} allowed:\n{}'.format(
+            len(ctx.captured_queries), limit,
+            '\n'.join(q['sql'] for q in ctx.captured_queries)))
+
+
+def assert_endpoint_within_budget(client, url, queries=None):
+    """
+    Request `url` with the test `client`, and raise QueryBudgetExceeded
+    if it issues more than `queries` queries (by default, the budget in
+    REQUEST_BUDGETS for the endpoint's URL name).
+    """
+    if queries is None:
+        from django.core.urlresolvers import resolve
+        match = resolve(url.split('?')[0])
+        queries = get_budget(match.url_name or match.view_name).get('queries')
+    with max_queries(queries if queries is not None else float('inf')):
+        response = client.get(url)
+    return response
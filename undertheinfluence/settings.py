@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'bootstrap_admin',
     'rest_framework',
     'djangobower',
+    'haystack',
 
     'wagtail.wagtailforms',
     'wagtail.wagtailredirects',
@@ -68,6 +69,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE_CLASSES = (
+    'undertheinfluence.instrumentation.InstrumentationMiddleware',
+
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -210,6 +213,74 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Stamp file holding the data version, which is bumped whenever
+# an import finishes (see datafetch/dataversion.py)
+DATA_VERSION_PATH = join(BASE_DIR, 'data', 'version')
+
+# Full-text search over actors' names (see datafetch/search.py). By
+# default that's a local Whoosh index, so no search server is needed.
+HAYSTACK_CONNECTIONS = conf.get('HAYSTACK_CONNECTIONS') or {
+    'default': {
+        'ENGINE': 'haystack.backends.whoosh_backend.WhooshEngine',
+        'PATH': join(BASE_DIR, 'data', 'whoosh_index'),
+    },
+}
+
+# Server-side cache of rendered API responses (see api/cache.py).
+# After an import, each process re-warms it with the WARM_KEYS URLs
+# it has been asked for most.
+API_CACHE = {
+    'BACKEND': 'api.cache.MemoryBackend',
+    'OPTIONS': {
+        'max_bytes': 64 * 1024 * 1024,
+    },
+    'WARM_KEYS': 50,
+}
+API_CACHE.update(conf.get('API_CACHE') or {})
+
+# How long (in seconds) the totals returned by the paginated
+# relationship lists are cached for
+API_COUNT_CACHE_TIMEOUT = 60 * 10
+
+# Whether the instrumentation middleware counts and times each request's
+# queries (which means keeping the SQL of every query, as DEBUG does)
+INSTRUMENT_QUERIES = DEBUG or bool(int(conf.get('INSTRUMENT_QUERIES') or 0))
+
+# Per-request limits, keyed by URL name ('default' applies to every
+# endpoint). Requests that go over are logged by the instrumentation
+# middleware. Times are in seconds, sizes in bytes.
+REQUEST_BUDGETS = {
+    'default': {
+        'queries': 50,
+        'db_time': 0.5,
+        'total_time': 2.0,
+    },
+    'api_donations_from': {'queries': 3},
+    'api_donations_to': {'queries': 3},
+    'api_consulting_agencies': {'queries': 3},
+    'api_consulting_clients': {'queries': 3},
+    'api_actor_bundle': {'queries': 5},
+    # (the index is rebuilt on the first request after an import)
+    'api_actor_autocomplete': {'queries': 5, 'total_time': 0.01},
+    # (the graph is rebuilt on the first request after an import)
+    'api_actor_path': {'queries': 5},
+    # (and the neighbours are looked up 500 at a time)
+    'api_actor_neighbourhood': {'queries': 7},
+    'api_rankings': {'queries': 3},
+    'api_actor_similar': {'queries': 2},
+}
+REQUEST_BUDGETS.update(conf.get('REQUEST_BUDGETS') or {})
+
+# How far (as a fraction of the stored baseline) each metric may
+# regress before `manage.py benchmark` fails
+BENCHMARK_THRESHOLDS = {
+    'wall_time': 0.5,
+    'queries': 0.1,
+    'rows_per_sec': 0.33,
+    'peak_memory': 0.25,
+}
+BENCHMARK_THRESHOLDS.update(conf.get('BENCHMARK_THRESHOLDS') or {})
+
 # TheyWorkForYou API key
 TWFY_API_KEY = conf.get('TWFY_API_KEY')
 
@@ -6,6 +6,8 @@ from wagtail.wagtailadmin import urls as wagtailadmin_urls
 from wagtail.wagtaildocs import urls as wagtaildocs_urls
 from wagtail.wagtailcore import urls as wagtail_urls
 
+from undertheinfluence import instrumentation
+
 
 urlpatterns = [
     url(r'^django-admin/', include(admin.site.urls)),
@@ -15,6 +17,7 @@ urlpatterns = [
 
     url(r'^appc-redirect/', include('appc_redirect.urls')),
     url(r'^api/', include('api.urls')),
+    url(r'^metrics$', instrumentation.metrics_view, name='metrics'),
 
     url(r'', include('datafetch.urls')),
 